@@ -2,21 +2,31 @@ import logging
 import os
 import secrets
 import string
+import sys
 from datetime import date
+from pathlib import Path
 from uuid import uuid4
 
 import pandas as pd
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import PyMongoError
+from recipients import cell_text, recipient_key
+from upserts import upsert_batch
+
+# The counter keys are shared with the API, which lives one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.stats_keys import count_stats
 
 load_dotenv()
 
 username = os.getenv("MONGO_USERNAME")
 password = os.getenv("MONGO_PASSWORD")
 host = os.getenv("MONGO_HOST")
-port = int(os.getenv("MONGO_PORT", 27017))
+port = int(os.getenv("MONGO_PORT", "27017"))
 db_name = os.getenv("DB_NAME")
 collection_name = os.getenv("COLLECTION_NAME")
+stats_collection_name = os.getenv("STATS_COLLECTION_NAME", "certificate_stats")
 
 category_code = os.getenv("CATEGORY_CODE")
 category_name = os.getenv("CATEGORY_NAME")
@@ -31,11 +41,17 @@ csv_output_file = os.getenv("CSV_OUTPUT_FILE", "certificates_export.csv")
 
 base_url = os.getenv("BASE_URL", "https://certify.sliitmozilla.org/certificate/")
 
+# "insert" keeps the original one-insert-per-row behaviour, "upsert" makes reruns
+# idempotent by keying every certificate on recipient + categoryCode + course.
+import_mode = os.getenv("IMPORT_MODE", "insert").strip().lower()
+batch_size = int(os.getenv("BATCH_SIZE", "500"))
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
     handlers=[logging.StreamHandler()]
 )
+logger = logging.getLogger(__name__)
 
 #uri = f"mongodb://{username}:{password}@{host}:{port}/"
 uri = f"mongodb+srv://{username}:{password}@{host}/{db_name}?retryWrites=true&w=majority"
@@ -44,80 +60,183 @@ uri = f"mongodb+srv://{username}:{password}@{host}/{db_name}?retryWrites=true&w=
 try:
     client = MongoClient(uri)
     client.server_info()
-    logging.info("Connected to MongoDB successfully!")
-except Exception as e:
-    logging.error(f"Could not connect to MongoDB: {e}")
-    exit(1)
+    logger.info("Connected to MongoDB successfully!")
+except PyMongoError as e:
+    logger.error(f"Could not connect to MongoDB: {e}")
+    sys.exit(1)
 
 db = client[db_name]
 collection = db[collection_name]
+stats_collection = db[stats_collection_name]
 
 def generate_credential_id() -> str:
     """Generate a unique credential ID."""
     prefix = secrets.choice(string.ascii_lowercase)
     raw_uuid = str(uuid4()).replace("-", "")
     credential_id = f"{prefix}{raw_uuid}"
-    logging.info(f"Generated credential ID: {credential_id}")
+    logger.info(f"Generated credential ID: {credential_id}")
     return credential_id
 
+def ensure_natural_key_index():
+    """Unique index backing the upsert mode.
+
+    Only documents carrying a recipientKey are indexed, so certificates imported
+    before the upsert mode existed never collide with each other.
+    """
+    collection.create_index(
+        [("recipientKey", 1), ("categoryCode", 1), ("course", 1)],
+        name="recipient_category_course_unique",
+        unique=True,
+        partialFilterExpression={"recipientKey": {"$exists": True}},
+    )
+
+def build_certificate(credential_id: str, name: str, email: str) -> dict:
+    certificate = {
+        "credentialId": credential_id,
+        "name": name,
+        "course": course,
+        "categoryCode": category_code,
+        "categoryName": category_name,
+        "dateIssued": date.today().isoformat(),
+        "issuer": issuer,
+        "signatures": signatures_list
+    }
+    if import_mode == "upsert":
+        certificate["recipientKey"] = recipient_key(name, email)
+        if email:
+            certificate["email"] = email
+    return certificate
+
+def record_stats(certificates: list[dict]):
+    """Increment the API's issuance counters (served by GET /api/stats).
+
+    Uses the same keys as record_certificates_issued in src/utils/db_utils.py.
+    """
+    counts = count_stats(certificates)
+    if not counts:
+        return
+    try:
+        stats_collection.bulk_write([
+            UpdateOne({"_id": {"dimension": dimension, "value": value}}, {"$inc": {"count": count}}, upsert=True)
+            for (dimension, value), count in counts.items()
+        ], ordered=False)
+        logger.info(f"Updated issuance stats for {len(certificates)} certificates")
+    except PyMongoError as e:
+        logger.error(f"Failed to update issuance stats, rebuild them from the API: {e}")
+
+def upsert_rows(batch: list[dict], stats: dict) -> list[dict]:
+    """Upsert one batch of recipients and return their export rows."""
+    credential_ids, inserted = upsert_batch(
+        collection,
+        batch,
+        {"categoryCode": category_code, "course": course},
+        lambda row: build_certificate(generate_credential_id(), row["name"], row["email"]),
+        stats,
+    )
+    record_stats(inserted)
+    export_rows = []
+    for row in batch:
+        credential_id = credential_ids.get(row["key"])
+        if credential_id:
+            export_rows.append({
+                "email": row["email"],
+                "name": row["name"],
+                "credId": credential_id,
+                "credUrl": f"{base_url}{credential_id}"
+            })
+    return export_rows
+
 try:
     df = pd.read_csv(csv_input_file)
-    logging.info(f"Read {len(df)} rows from {csv_input_file}")
-except Exception as e:
-    logging.error(f"Failed to read CSV file: {e}")
-    exit(1)
+    logger.info(f"Read {len(df)} rows from {csv_input_file}")
+except (OSError, ValueError) as e:
+    logger.error(f"Failed to read CSV file: {e}")
+    sys.exit(1)
 
 if len(df) == 0:
-    logging.warning("No data found in the CSV. Exiting.")
-    exit(0)
+    logger.warning("No data found in the CSV. Exiting.")
+    sys.exit(0)
 
 print(f"Found {len(df)} certificates to insert.")
 confirmation = input("Do you want to continue? (y/n): ").strip().lower()
 if confirmation != "y":
-    logging.info("Operation cancelled by user.")
-    exit(0)
+    logger.info("Operation cancelled by user.")
+    sys.exit(0)
 
 export_data = []
 
-for _, row in df.iterrows():
+if import_mode == "upsert":
     try:
-        name = str(row[csv_name_col]).strip()
-        email = str(row[csv_email_col]).strip() if csv_email_col else ""  
+        ensure_natural_key_index()
+    except PyMongoError as e:
+        logger.error(f"Could not create the recipient/category/course unique index: {e}")
+        sys.exit(1)
+
+    stats = {"inserted": 0, "matched": 0, "failed": 0, "skipped": 0}
+    seen_keys = set()
+    batch = []
+    for _, row in df.iterrows():
+        name = cell_text(row[csv_name_col])
+        email = cell_text(row[csv_email_col]) if csv_email_col else ""
 
         if not name:
-            logging.warning(f"Skipping row with missing name: {row}")
+            logger.warning(f"Skipping row with missing name: {row}")
+            stats["skipped"] += 1
             continue
 
-        credential_id = generate_credential_id()
-
-        certificate = {
-            "credentialId": credential_id,
-            "name": name,
-            "course": course,
-            "categoryCode": category_code,
-            "categoryName": category_name,
-            "dateIssued": date.today().isoformat(),
-            "issuer": issuer,
-            "signatures": signatures_list
-        }
-
-        collection.insert_one(certificate)
-        logging.info(f"Inserted certificate for {name}")
-
-        export_data.append({
-            "email": email,
-            "name": name,
-            "credId": credential_id,
-            "credUrl": f"{base_url}{credential_id}"
-        })
-
-    except Exception as e:
-        logging.error(f"Failed to insert certificate for row {row}: {e}")
+        key = recipient_key(name, email)
+        if key in seen_keys:
+            logger.warning(f"Skipping duplicate recipient in CSV: {key}")
+            stats["skipped"] += 1
+            continue
+        seen_keys.add(key)
+
+        batch.append({"key": key, "name": name, "email": email})
+        if len(batch) >= batch_size:
+            export_data.extend(upsert_rows(batch, stats))
+            batch = []
+    if batch:
+        export_data.extend(upsert_rows(batch, stats))
+
+    logger.info(
+        f"Import finished: {stats['inserted']} inserted, {stats['matched']} matched, "
+        f"{stats['failed']} failed, {stats['skipped']} skipped"
+    )
+else:
+    inserted_certificates = []
+    for _, row in df.iterrows():
+        try:
+            name = cell_text(row[csv_name_col])
+            email = cell_text(row[csv_email_col]) if csv_email_col else ""
+
+            if not name:
+                logger.warning(f"Skipping row with missing name: {row}")
+                continue
+
+            credential_id = generate_credential_id()
+
+            certificate = build_certificate(credential_id, name, email)
+
+            collection.insert_one(certificate)
+            inserted_certificates.append(certificate)
+            logger.info(f"Inserted certificate for {name}")
+
+            export_data.append({
+                "email": email,
+                "name": name,
+                "credId": credential_id,
+                "credUrl": f"{base_url}{credential_id}"
+            })
+
+        except (PyMongoError, KeyError) as e:
+            logger.error(f"Failed to insert certificate for row {row}: {e}")
+
+    record_stats(inserted_certificates)
 
 if export_data:
     try:
         export_df = pd.DataFrame(export_data, columns=["email", "name", "credId", "credUrl"])
         export_df.to_csv(csv_output_file, index=False)
-        logging.info(f"Exported credentials to {csv_output_file}")
-    except Exception as e:
-        logging.error(f"Failed to export CSV: {e}")
+        logger.info(f"Exported credentials to {csv_output_file}")
+    except OSError as e:
+        logger.error(f"Failed to export CSV: {e}")
@@ -0,0 +1,15 @@
+import pandas as pd
+
+
+def cell_text(value) -> str:
+    """A CSV cell as stripped text; blank cells (read by pandas as NaN) become ""."""
+    if pd.isna(value):
+        return ""
+    return str(value).strip()
+
+
+def recipient_key(name: str, email: str) -> str:
+    """Natural key for a recipient: the email if we have one, otherwise the name."""
+    if email:
+        return email.strip().lower()
+    return " ".join(name.split()).casefold()
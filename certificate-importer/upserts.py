@@ -0,0 +1,80 @@
+import logging
+from collections.abc import Callable
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+def upsert_batch(
+    collection: Collection,
+    batch: list[dict],
+    scope: dict,
+    new_certificate: Callable[[dict], dict],
+    stats: dict,
+) -> tuple[dict[str, str], list[dict]]:
+    """Upsert one batch of recipients keyed on recipientKey within scope.
+
+    batch rows carry "key", "name" and "email"; scope is the categoryCode/course
+    filter every certificate of this import shares. Recipients already present keep
+    their original credentialId and only new rows get a certificate from
+    new_certificate(row), so a rerun of the same CSV costs one indexed find per
+    batch and no writes. Returns the credentialId of every recipient that has one
+    and the certificates this call actually inserted.
+    """
+    keys = [row["key"] for row in batch]
+    credential_ids = {
+        doc["recipientKey"]: doc["credentialId"]
+        for doc in collection.find(
+            {"recipientKey": {"$in": keys}, **scope},
+            {"_id": 0, "recipientKey": 1, "credentialId": 1},
+        )
+    }
+    stats["matched"] += len(credential_ids)
+
+    pending = [row for row in batch if row["key"] not in credential_ids]
+    certificates = [new_certificate(row) for row in pending]
+    operations = [
+        UpdateOne(
+            {"recipientKey": row["key"], **scope},
+            {"$setOnInsert": certificate},
+            upsert=True,
+        )
+        for row, certificate in zip(pending, certificates, strict=True)
+    ]
+
+    upserted: set[int] = set()
+    failed: set[int] = set()
+    if operations:
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            upserted = set(result.upserted_ids)
+        except BulkWriteError as e:
+            upserted = {item["index"] for item in e.details.get("upserted", [])}
+            for error in e.details.get("writeErrors", []):
+                failed.add(error["index"])
+                logger.error(
+                    f"Failed to upsert certificate for {pending[error['index']]['name']}: "
+                    f"{error.get('errmsg')}"
+                )
+
+    # Anything neither upserted nor failed was inserted concurrently by another
+    # run between our find and bulk_write; report the credentialId it got.
+    raced = [
+        row["key"] for i, row in enumerate(pending) if i not in upserted and i not in failed
+    ]
+    if raced:
+        for doc in collection.find(
+            {"recipientKey": {"$in": raced}, **scope},
+            {"_id": 0, "recipientKey": 1, "credentialId": 1},
+        ):
+            credential_ids[doc["recipientKey"]] = doc["credentialId"]
+        stats["matched"] += len(raced)
+
+    stats["inserted"] += len(upserted)
+    stats["failed"] += len(failed)
+    for i in upserted:
+        credential_ids[pending[i]["key"]] = certificates[i]["credentialId"]
+    return credential_ids, [certificates[i] for i in sorted(upserted)]
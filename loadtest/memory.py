@@ -0,0 +1,110 @@
+"""Report the peak memory each certificate render allocates, using tracemalloc.
+
+Renders certificates from the seeded mongomock stand-in through every response
+path (JSON payload or bare image, PNG or SVG) and records the peak bytes
+allocated per render. Pillow allocates pixel buffers outside Python's allocator,
+where tracemalloc cannot see them, so the PNG canvas is added from the style's
+dimensions. The worst case times RENDER_MAX_CONCURRENCY is the render headroom one
+worker needs; size WEB_CONCURRENCY accordingly.
+
+Usage: python -m loadtest.memory --renders 20
+"""
+import argparse
+import json
+import logging
+import statistics
+from pathlib import Path
+
+from loadtest.standin import seed_standin
+from src.config import RENDER_MAX_CONCURRENCY
+from src.utils.certificate_img_utils import get_certificate_style
+from src.utils.certificate_utils import (
+    load_certificate,
+    render_certificate,
+    render_certificate_image,
+    with_signature_images,
+)
+from src.utils.process_utils import peak_allocation
+
+PATHS = [
+    ("json png", render_certificate, "png"),
+    ("json svg", render_certificate, "svg"),
+    ("image png", render_certificate_image, "png"),
+    ("image svg", render_certificate_image, "svg"),
+]
+
+
+def canvas_bytes(cert_doc: dict) -> int:
+    # Pillow stores RGB canvases with 4 bytes per pixel
+    style = get_certificate_style(cert_doc.get("categoryCode") or "PART")
+    return style.get("width", 900) * style.get("height", 600) * 4
+
+
+def measure(cert_docs: list[dict]) -> list[dict]:
+    rows = []
+    for name, render, fmt in PATHS:
+        # The first render also loads fonts, the logo and signatures into their
+        # process-wide caches; report it separately from steady-state renders.
+        body, first_peak = peak_allocation(render, cert_docs[0], fmt)
+        peaks = []
+        for cert_doc in cert_docs:
+            body, peak = peak_allocation(render, cert_doc, fmt)
+            peaks.append(peak)
+        canvas = max(map(canvas_bytes, cert_docs)) if fmt == "png" else 0
+        rows.append({
+            "path": name,
+            "first_peak_bytes": first_peak,
+            "median_peak_bytes": int(statistics.median(peaks)),
+            "max_peak_bytes": max(peaks),
+            "canvas_bytes": canvas,
+            "body_bytes": len(body),
+            "worker_headroom_bytes": (max(peaks) + canvas) * RENDER_MAX_CONCURRENCY,
+        })
+    return rows
+
+
+def print_rows(rows: list[dict]):
+    mb = 1024 * 1024
+    slots = f"x{RENDER_MAX_CONCURRENCY} slots"
+    print(f"{'path':<10} {'first':>9} {'median':>9} {'max':>9} {'canvas':>9} {'body':>9} {slots:>10}")
+    for row in rows:
+        print(
+            f"{row['path']:<10} "
+            f"{row['first_peak_bytes'] / mb:8.2f}M "
+            f"{row['median_peak_bytes'] / mb:8.2f}M "
+            f"{row['max_peak_bytes'] / mb:8.2f}M "
+            f"{row['canvas_bytes'] / mb:8.2f}M "
+            f"{row['body_bytes'] / 1024:8.1f}K "
+            f"{row['worker_headroom_bytes'] / mb:9.2f}M"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=20, help="certificates rendered per path")
+    parser.add_argument("--signatures", type=int, default=2, help="signatures to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    ids = seed_standin(args.renders, args.signatures, args.seed)
+    cert_docs = [
+        with_signature_images(load_certificate(credential_id)[0]) for credential_id in ids
+    ]
+    rows = measure(cert_docs)
+    print_rows(rows)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({"config": vars(args), "renders": rows}, indent=2))
+        print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
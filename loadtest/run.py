@@ -0,0 +1,340 @@
+"""Load test the certificate API with Zipf-distributed credential IDs.
+
+By default `python -m loadtest.server` is started in a child process against a
+seeded mongomock stand-in and driven over HTTP, so the server's CPU and RSS are
+measured apart from the load generator. With --url the same workload is sent to
+an already running server, and --pid names its process (workers forked from it
+are sampled too). --in-process boots the app in this process over ASGI instead,
+where the figures include the generator.
+
+Usage: python -m loadtest.run --certificates 1000 --concurrency 1,8,32 --duration 10
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import UTC, datetime
+from itertools import accumulate
+from pathlib import Path
+
+import httpx
+import psutil
+
+from loadtest.standin import (
+    LOAD_USER_EMAIL,
+    LOAD_USER_PASSWORD,
+    credential_ids,
+    seed_standin,
+)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+# How long the child server may take to seed the stand-in and start listening
+SERVER_START_TIMEOUT_SECONDS = 120
+
+
+class ZipfSampler:
+    """Draw items so that the k-th most popular one is picked with weight 1/k^s."""
+
+    def __init__(self, items: list[str], s: float, rng: random.Random):
+        self.items = items[:]
+        rng.shuffle(self.items)  # popularity rank is independent of insertion order
+        self.cumulative = list(accumulate(1 / (k ** s) for k in range(1, len(items) + 1)))
+        self.rng = rng
+
+    def sample(self) -> str:
+        point = self.rng.random() * self.cumulative[-1]
+        return self.items[bisect.bisect_left(self.cumulative, point)]
+
+
+def summarize(latencies: list[float]) -> dict:
+    if not latencies:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    if len(latencies) == 1:
+        value = latencies[0] * 1000
+        return {"p50": value, "p95": value, "p99": value, "mean": value, "max": value}
+    q = statistics.quantiles(latencies, n=100)
+    return {
+        "p50": q[49] * 1000,
+        "p95": q[94] * 1000,
+        "p99": q[98] * 1000,
+        "mean": statistics.fmean(latencies) * 1000,
+        "max": max(latencies) * 1000,
+    }
+
+
+class ProcessSampler:
+    """CPU and RSS of a server process and the workers it forked, per pid."""
+
+    def __init__(self, pid: int, role: str):
+        self.root = psutil.Process(pid)
+        self.role = role
+        self._processes: dict[int, psutil.Process] = {}
+
+    def _tree(self) -> list[psutil.Process]:
+        try:
+            return [self.root, *self.root.children(recursive=True)]
+        except psutil.NoSuchProcess:
+            return []
+
+    def start(self):
+        self._processes = {process.pid: process for process in self._tree()}
+        for process in self._processes.values():
+            process.cpu_percent()  # reset the sampling window
+
+    def stop(self) -> list[dict]:
+        # Workers started during the level report 0% CPU for their first window
+        for process in self._tree():
+            self._processes.setdefault(process.pid, process)
+        samples = []
+        for pid, process in sorted(self._processes.items()):
+            try:
+                samples.append({
+                    "pid": pid,
+                    "role": self.role if process is self.root else "worker",
+                    "cpu_percent": process.cpu_percent(),
+                    "rss_mb": process.memory_info().rss / (1024 * 1024),
+                })
+            except psutil.NoSuchProcess:
+                continue
+        return samples
+
+
+async def run_level(http: httpx.AsyncClient, concurrency: int, args, sampler, processes) -> dict:
+    deadline = time.perf_counter() + args.duration
+    rng = random.Random(args.seed + concurrency)
+    latencies: dict[str, list[float]] = {"certificate": [], "login": []}
+    statuses: dict[str, int] = {}
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            if rng.random() < args.login_ratio:
+                endpoint = "login"
+                request = http.post(
+                    "/api/login",
+                    json={"email": LOAD_USER_EMAIL, "password": LOAD_USER_PASSWORD},
+                )
+            else:
+                endpoint = "certificate"
+                request = http.get(f"/api/certificate/{sampler.sample()}")
+            started = time.perf_counter()
+            try:
+                response = await request
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies[endpoint].append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not status.startswith(("2", "3")):
+                errors += 1
+
+    if processes is not None:
+        processes.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    samples = processes.stop() if processes is not None else []
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "statuses": statuses,
+        "throughput_rps": total / elapsed,
+        "latency_ms": summarize(latencies["certificate"] + latencies["login"]),
+        "endpoints": {
+            name: {"requests": len(values), "latency_ms": summarize(values)}
+            for name, values in latencies.items()
+        },
+        "processes": samples,
+        # Totals over the sampled processes; None when nothing was sampled
+        "cpu_percent": sum(p["cpu_percent"] for p in samples) if samples else None,
+        "rss_mb": sum(p["rss_mb"] for p in samples) if samples else None,
+    }
+
+
+def print_level(level: dict):
+    latency = level["latency_ms"]
+    if level["cpu_percent"] is None:
+        usage = "cpu=     n/a rss=    n/a"
+    else:
+        usage = f"cpu={level['cpu_percent']:6.1f}% rss={level['rss_mb']:7.1f}MB"
+    print(
+        f"c={level['concurrency']:<4} "
+        f"rps={level['throughput_rps']:8.1f} "
+        f"p50={latency['p50']:8.2f}ms p95={latency['p95']:8.2f}ms "
+        f"p99={latency['p99']:8.2f}ms "
+        f"errors={level['errors']:<5} "
+        f"{usage}"
+    )
+    if len(level["processes"]) > 1:
+        for process in level["processes"]:
+            print(
+                f"       pid={process['pid']:<8} {process['role']:<7} "
+                f"cpu={process['cpu_percent']:6.1f}% rss={process['rss_mb']:7.1f}MB"
+            )
+
+
+def compare(current: dict, baseline_path: str):
+    baseline = json.loads(Path(baseline_path).read_text())
+    by_concurrency = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nCompared with {baseline_path}:")
+    for level in current["levels"]:
+        old = by_concurrency.get(level["concurrency"])
+        if not old:
+            continue
+        rps_delta = (level["throughput_rps"] / old["throughput_rps"] - 1) * 100
+        p99_delta = level["latency_ms"]["p99"] - old["latency_ms"]["p99"]
+        print(
+            f"c={level['concurrency']:<4} rps {rps_delta:+6.1f}%  "
+            f"p99 {p99_delta:+8.2f}ms"
+        )
+
+
+def git_commit() -> str:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=False
+    )
+    return result.stdout.strip()
+
+
+def start_server(args) -> tuple[subprocess.Popen, str]:
+    """Start loadtest.server on a free port and wait until it answers."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen([
+        sys.executable, "-m", "loadtest.server",
+        "--certificates", str(args.certificates),
+        "--signatures", str(args.signatures),
+        "--seed", str(args.seed),
+        "--port", str(port),
+    ])
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while True:
+        if server.poll() is not None:
+            raise SystemExit(f"loadtest.server exited with status {server.returncode}")
+        try:
+            httpx.get(f"{url}/", timeout=1)
+            return server, url
+        except httpx.HTTPError:
+            if time.monotonic() > deadline:
+                server.terminate()
+                raise SystemExit("loadtest.server did not start in time") from None
+            time.sleep(0.2)
+
+
+async def main_async(args, url: str | None, pid: int | None) -> dict:
+    rng = random.Random(args.seed)
+    if url:
+        ids = credential_ids(args.certificates)
+        transport = None
+        processes = ProcessSampler(pid, "server") if pid else None
+    else:
+        ids = seed_standin(args.certificates, args.signatures, args.seed)
+        from src.main import app
+
+        # Report unhandled app errors as 500s instead of aborting the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        # The app shares this process with the load generator
+        processes = ProcessSampler(psutil.Process().pid, "server+driver")
+
+    sampler = ZipfSampler(ids, args.zipf_s, rng)
+    levels = []
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url=url or "http://loadtest",
+        limits=limits,
+        timeout=args.timeout,
+    ) as http:
+        if transport is not None:
+            from src.main import app
+
+            async with app.router.lifespan_context(app):
+                for concurrency in args.concurrency:
+                    levels.append(await run_level(http, concurrency, args, sampler, processes))
+                    print_level(levels[-1])
+        else:
+            for concurrency in args.concurrency:
+                levels.append(await run_level(http, concurrency, args, sampler, processes))
+                print_level(levels[-1])
+
+    return {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "git_commit": args.git_commit,
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "git_commit")},
+        "levels": levels,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--certificates", type=int, default=1000, help="certificates to seed")
+    parser.add_argument("--signatures", type=int, default=2, help="signatures to seed")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda v: [int(c) for c in v.split(",")],
+        default=[1, 8, 32],
+        help="comma separated concurrency sweep",
+    )
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--login-ratio", type=float, default=0.05, help="share of /api/login requests")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="server PID to sample CPU/RSS from with --url")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="drive the app over ASGI in this process (CPU/RSS include the driver)",
+    )
+    parser.add_argument("--output", help="results file (default loadtest/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Per-request logging (and font fallback warnings) would dominate the measurement
+    logging.disable(logging.WARNING)
+
+    # Resolved before the event loop starts so the blocking call is not timed
+    args.git_commit = git_commit()
+    server = None
+    url, pid = args.url, args.pid
+    if not url and not args.in_process:
+        server, url = start_server(args)
+        pid = server.pid
+    try:
+        result = asyncio.run(main_async(args, url, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Serve the API under uvicorn against a seeded mongomock stand-in.
+
+Usage: python -m loadtest.server --certificates 1000 --port 8100
+"""
+import argparse
+import logging
+
+import uvicorn
+
+from loadtest.standin import seed_standin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--certificates", type=int, default=1000)
+    parser.add_argument("--signatures", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    # Per-request logging would dominate the measurement, as in loadtest.run
+    logging.disable(logging.WARNING)
+
+    seed_standin(args.certificates, args.signatures, args.seed)
+    from src.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Seed a mongomock stand-in database and plug it into the API."""
+import random
+from datetime import date, timedelta
+
+import bcrypt
+import mongomock
+
+from src.utils import db_utils
+
+CATEGORY_CODES = ["PART", "CN", "DEPLOYIT", "APPRECIATION", "MERIT", "ACHV"]
+LOAD_USER_EMAIL = "loadtest@example.com"
+LOAD_USER_PASSWORD = "loadtest"
+
+
+def credential_ids(count: int) -> list[str]:
+    """Deterministic credential IDs, so separate processes agree on the data set."""
+    return [f"load{i:08d}" for i in range(count)]
+
+
+def seed_standin(certificates: int, signatures: int, seed: int = 42) -> list[str]:
+    """Build an in-memory database, install it as the shared client, return the IDs."""
+    rng = random.Random(seed)
+    client = mongomock.MongoClient()
+    db = client["certify"]
+
+    with open("test_signature.b64", "r") as f:
+        signature_b64 = f.read().strip()
+    signature_ids = [f"sig{i:04d}" for i in range(signatures)]
+    db["signatures"].insert_many([
+        {
+            "id": sig_id,
+            "name": f"Signer {i}",
+            "post": "President",
+            "image_b64": signature_b64,
+            "imageDigest": db_utils.signature_image_digest(signature_b64),
+        }
+        for i, sig_id in enumerate(signature_ids)
+    ])
+
+    ids = credential_ids(certificates)
+    today = date.today()
+    db["certificates"].insert_many([
+        {
+            "credentialId": cred_id,
+            "name": f"Recipient {i} {'Long Name ' * rng.randint(0, 3)}".strip(),
+            "course": "has participated in the load testing workshop",
+            "categoryCode": rng.choice(CATEGORY_CODES),
+            "categoryName": "Participation",
+            "dateIssued": (today - timedelta(days=rng.randint(0, 365))).isoformat(),
+            "issuer": "Mozilla Campus Club SLIIT",
+            "signatures": rng.sample(signature_ids, k=min(2, len(signature_ids))),
+        }
+        for i, cred_id in enumerate(ids)
+    ])
+
+    # Seeding users up front also keeps lifespan from hashing its sample users
+    hashed = bcrypt.hashpw(LOAD_USER_PASSWORD.encode(), bcrypt.gensalt(rounds=4))
+    db["users"].insert_one({
+        "name": "Load Test",
+        "email": LOAD_USER_EMAIL,
+        "password": hashed.decode(),
+        "role": "admin",
+    })
+
+    db_utils.set_client(client)
+    return ids
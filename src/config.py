@@ -10,3 +10,105 @@ PORT = int(os.getenv("PORT", 8000))
 SECRET_KEY = os.getenv("SECRET_KEY", "super-secret-key-change-this")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+
+# Ed25519 private key that signs /verify responses: a PEM private key or a base64
+# 32-byte seed. Deliberately separate from SECRET_KEY, with no fallback; /verify
+# answers 503 until it is set. The public half is served at /api/verify/public-key.
+VERIFY_SIGNING_KEY = os.getenv("VERIFY_SIGNING_KEY")
+
+# HTTP caching for certificate metadata. Certificates are effectively immutable, so
+# clients and the CDN may reuse a response for CERTIFICATE_CACHE_MAX_AGE seconds and
+# keep serving it while revalidating for CERTIFICATE_CACHE_STALE_WHILE_REVALIDATE.
+CERTIFICATE_CACHE_MAX_AGE = int(os.getenv("CERTIFICATE_CACHE_MAX_AGE", "3600"))
+CERTIFICATE_CACHE_STALE_WHILE_REVALIDATE = int(
+    os.getenv("CERTIFICATE_CACHE_STALE_WHILE_REVALIDATE", "86400")
+)
+# How long clients and the CDN may reuse a GET /api/stats response
+STATS_CACHE_MAX_AGE = int(os.getenv("STATS_CACHE_MAX_AGE", "60"))
+
+# MongoDB client. One pooled client is shared per process; size MONGO_MAX_POOL_SIZE
+# per uvicorn worker using the pool stats exposed on /api/admin/metrics.
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "certify")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+)
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+# Wire compression in order of preference; compressors whose Python package is not
+# installed (zstandard for zstd, python-snappy for snappy) are skipped.
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+# Read preference for the read-heavy certificate, signature, listing and stats
+# lookups. Seeding, logins and other read-after-write paths always use the primary.
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "secondaryPreferred")
+
+# In-memory cache of rendered certificate payloads, bounded by the approximate size
+# of the images it holds.
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# On-disk cache of rendered images shared by all workers on a host and kept across
+# restarts. Least recently used files are evicted every
+# DISK_CACHE_EVICT_INTERVAL_SECONDS once it exceeds DISK_CACHE_MAX_BYTES. The
+# default lives in the user's cache directory rather than the shared temp dir; the
+# directory must belong to the app's user and not be writable by others. Set
+# DISK_CACHE_DIR to an empty string to disable it.
+DISK_CACHE_DIR = os.getenv(
+    "DISK_CACHE_DIR",
+    os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "certify",
+        "renders",
+    ),
+)
+DISK_CACHE_MAX_BYTES = int(os.getenv("DISK_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+DISK_CACHE_EVICT_INTERVAL_SECONDS = float(
+    os.getenv("DISK_CACHE_EVICT_INTERVAL_SECONDS", "60")
+)
+
+# Popularity tracking and background prewarming of the render cache. Counters are
+# halved every POPULARITY_DECAY_INTERVAL_SECONDS (lazily, as views are recorded or
+# read) so the hot set follows recent traffic.
+POPULARITY_TOP_K = int(os.getenv("POPULARITY_TOP_K", "100"))
+POPULARITY_DECAY_INTERVAL_SECONDS = int(
+    os.getenv("POPULARITY_DECAY_INTERVAL_SECONDS", "300")
+)
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_INTERVAL_SECONDS = int(os.getenv("PREWARM_INTERVAL_SECONDS", "30"))
+PREWARM_HOT_COUNT = int(os.getenv("PREWARM_HOT_COUNT", "20"))
+PREWARM_RECENT_COUNT = int(os.getenv("PREWARM_RECENT_COUNT", "20"))
+
+# Admission control for certificate renders. At most RENDER_MAX_CONCURRENCY renders
+# run at once and at most RENDER_MAX_QUEUE requests wait for a slot. A request that
+# cannot start rendering within RENDER_DEADLINE_SECONDS of arriving is shed with a
+# 503 (or served a previously rendered image in degraded mode).
+RENDER_MAX_CONCURRENCY = int(
+    os.getenv("RENDER_MAX_CONCURRENCY", min(4, os.cpu_count() or 1))
+)
+RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", "16"))
+RENDER_DEADLINE_SECONDS = float(os.getenv("RENDER_DEADLINE_SECONDS", "2.0"))
+RENDER_RETRY_AFTER_SECONDS = int(os.getenv("RENDER_RETRY_AFTER_SECONDS", "5"))
+
+# Production server (python -m src.server). WEB_CONCURRENCY defaults to the number
+# of CPUs available to the container. Workers are recycled after
+# WORKER_MAX_REQUESTS (+ random jitter) requests or once their RSS exceeds
+# WORKER_MAX_RSS_MB; 0 disables either limit.
+HOST = os.getenv("HOST", "0.0.0.0")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
+WORKER_MAX_REQUESTS_JITTER = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "1000"))
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "512"))
+WORKER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("WORKER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+
+# On-demand request profiling. When enabled, an admin can profile a single
+# certificate or login request by sending the X-Certify-Profile header, and one in
+# every PROFILING_SAMPLE_RATE requests (0 = never) is profiled into
+# PROFILING_OUTPUT_DIR. Nothing is installed when PROFILING_ENABLED is false.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_SAMPLE_RATE = int(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+PROFILING_OUTPUT_DIR = os.getenv("PROFILING_OUTPUT_DIR", "profiles")
+# Stored profiles kept in PROFILING_OUTPUT_DIR; older ones are deleted (0 = keep all)
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "200"))
@@ -1,21 +1,58 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+from datetime import date
+from typing import Annotated, Literal
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 
-from src.models import Certificate
+from src.config import (
+    CERTIFICATE_CACHE_MAX_AGE,
+    PROFILING_ENABLED,
+    RENDER_DEADLINE_SECONDS,
+    RENDER_RETRY_AFTER_SECONDS,
+    STATS_CACHE_MAX_AGE,
+)
 from src.utils import (
-    get_certificate_by_credential,
-    get_signatures_by_ids,
+    OverloadedError,
+    ProfilingMiddleware,
+    artifact_key,
+    certificate_cache_headers,
+    disk_cache,
+    etag_matches,
+    fetch_certificate,
+    fetch_verification,
+    format_etag,
+    get_certificate_stats,
+    get_coalescing_stats,
+    get_current_admin,
+    get_current_user,
+    get_degraded_payload,
+    get_hot_report,
+    get_pool_stats,
+    get_public_key_info,
+    image_etag,
     lifespan,
     process_login_request,
-    setup_db,
+    rebuild_certificate_stats,
+    record_certificate_view,
+    render_admission,
+    render_cache,
+    render_certificate_payload,
+    search_certificates,
     setup_logging,
+    signing_configured,
 )
-from src.utils.certificate_img_utils import generate_certificate_image
 
 logger = setup_logging(__name__)
-db,client = setup_db()
 app = FastAPI(lifespan=lifespan)
 
+# Opt-in profiling hook; when disabled nothing is added to the request path.
+# Registered first so it sits inside CORS and profile responses get CORS headers.
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -36,25 +73,167 @@ async def login(request: Request):
     return await process_login_request(request)
 
 
+IMAGE_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+async def serve_certificate(
+    credential_id: str, request: Request, fmt: str, image: bool
+) -> Response:
+    """Serve a certificate as its JSON payload or, with image=True, the bare image."""
+    deadline = time.monotonic() + RENDER_DEADLINE_SECONDS
+    loaded = await fetch_certificate(credential_id)
+    if not loaded:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    cert_doc, etag = loaded
+    artifact = artifact_key(etag, fmt)
+    etag = image_etag(etag, fmt) if image else format_etag(etag, fmt)
+    record_certificate_view(credential_id, cert_doc.get("categoryCode"))
+
+    # Validate before rendering: a matching If-None-Match skips the render entirely
+    cache_headers = certificate_cache_headers(etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    media_type = IMAGE_MEDIA_TYPES[fmt] if image else "application/json"
+    if image:
+        # Already on disk: FileResponse streams it from a worker thread (or by
+        # path, under servers with pathsend), never reading it on the event loop
+        path = disk_cache.lookup(artifact, fmt)
+        if path is not None:
+            return FileResponse(path, media_type=media_type, headers=cache_headers)
+    try:
+        body = await render_certificate_payload(
+            cert_doc, etag, deadline, fmt, image, artifact
+        )
+    except OverloadedError as e:
+        # Shed load: serve an earlier render of this certificate if we have one
+        stale = get_degraded_payload(credential_id, fmt, image)
+        if stale is None:
+            logger.warning("Rejected certificate render for %s: %s", credential_id, e)
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(RENDER_RETRY_AFTER_SECONDS)},
+            )
+        logger.warning("Serving degraded render for %s: %s", credential_id, e)
+        return Response(
+            content=stale,
+            media_type=media_type,
+            headers={"Cache-Control": "no-store", "X-Certify-Degraded": "1"},
+        )
+
+    # The body is already encoded; hand it to the response as is
+    return Response(content=body, media_type=media_type, headers=cache_headers)
+
+
 @app.get("/api/certificate/{credential_id}")
-async def get_certificate(credential_id: str):
+async def get_certificate(
+    credential_id: str,
+    request: Request,
+    fmt: Literal["png", "svg"] = Query("png", alias="format"),
+):
     logger.info(credential_id)
-    cert_doc = get_certificate_by_credential(credential_id)
-    if not cert_doc:
+    return await serve_certificate(credential_id, request, fmt, image=False)
+
+
+@app.get("/api/certificate/{credential_id}/image")
+async def get_certificate_image(
+    credential_id: str,
+    request: Request,
+    fmt: Literal["png", "svg"] = Query("png", alias="format"),
+):
+    logger.info(credential_id)
+    return await serve_certificate(credential_id, request, fmt, image=True)
+
+
+@app.api_route("/api/certificate/{credential_id}/verify", methods=["GET", "HEAD"])
+async def verify_certificate(credential_id: str, request: Request):
+    if not signing_configured():
+        raise HTTPException(
+            status_code=503, detail="Certificate verification is not configured"
+        )
+    # Projected lookup only: no signature blobs are read and nothing is rendered
+    loaded = await fetch_verification(credential_id)
+    if not loaded:
         raise HTTPException(status_code=404, detail="Certificate not found")
+    body, etag = loaded
+    headers = certificate_cache_headers(etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(body))
+        return Response(media_type="application/json", headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/verify/public-key")
+async def get_verification_public_key(response: Response):
+    # The key that checks /verify signatures offline. Cached as long as the /verify
+    # responses it signs, so a client holding one of those can still fetch its key.
+    if not signing_configured():
+        raise HTTPException(
+            status_code=503, detail="Certificate verification is not configured"
+        )
+    response.headers["Cache-Control"] = f"public, max-age={CERTIFICATE_CACHE_MAX_AGE}"
+    return get_public_key_info()
+
+
+@app.get("/api/certificates")
+async def list_certificates(
+    user: Annotated[dict, Depends(get_current_user)],
+    categoryCode: str | None = None,
+    course: str | None = None,
+    dateFrom: date | None = None,
+    dateTo: date | None = None,
+    namePrefix: str | None = Query(None, min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+):
+    try:
+        return await run_in_threadpool(
+            search_certificates,
+            category_code=categoryCode,
+            course=course,
+            date_from=dateFrom,
+            date_to=dateTo,
+            name_prefix=namePrefix,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/api/stats")
+async def get_stats(response: Response):
+    # Reads the incrementally maintained summary; never scans certificates
+    response.headers["Cache-Control"] = f"public, max-age={STATS_CACHE_MAX_AGE}"
+    return await run_in_threadpool(get_certificate_stats)
+
+
+@app.post("/api/admin/stats/rebuild")
+async def rebuild_stats(admin: Annotated[dict, Depends(get_current_admin)]):
+    counters = await run_in_threadpool(rebuild_certificate_stats)
+    return {"counters": counters}
+
 
-    signatures = get_signatures_by_ids(cert_doc.get("signatures", []))
-    cert_doc["signatures"] = signatures
+@app.get("/api/admin/metrics")
+async def get_metrics(admin: Annotated[dict, Depends(get_current_admin)]):
+    return {
+        "mongo_pool": get_pool_stats(),
+        "coalescing": get_coalescing_stats(),
+        "render_cache": render_cache.stats(),
+        "disk_cache": disk_cache.stats(),
+        "render_admission": render_admission.stats(),
+    }
 
-    cert = Certificate(**cert_doc)
-    img_b64 = generate_certificate_image(cert)
 
-    # Return all certificate fields plus image_b64
-    cert_dict = cert.dict(by_alias=True)
-    cert_dict["image_b64"] = img_b64
-    return cert_dict
+@app.get("/api/admin/hot")
+async def get_hot_certificates(admin: Annotated[dict, Depends(get_current_admin)]):
+    return get_hot_report()
 
 
 # Note: To use the PORT variable, run the server with:
 # python -m uvicorn src.main:app --reload --port %PORT%
 # (on Windows CMD; use $PORT for bash)
+# In production use the multi-worker entry point instead: python -m src.server
@@ -0,0 +1,203 @@
+"""Production entry point: a pre-forking multi-worker uvicorn server.
+
+Run with ``python -m src.server``. The parent process binds the listening socket,
+imports the app, seeds and indexes the database once and preloads the render
+assets (fonts, logo), then forks WEB_CONCURRENCY workers that share those pages
+copy-on-write. Each worker opens its own MongoDB client after the fork, serves
+requests with uvicorn and is replaced once it has handled WORKER_MAX_REQUESTS
+requests or its RSS exceeds WORKER_MAX_RSS_MB. SIGTERM/SIGINT stop the workers
+gracefully.
+"""
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+
+import uvicorn
+
+from src.config import (
+    HOST,
+    PORT,
+    WEB_CONCURRENCY,
+    WORKER_GRACEFUL_TIMEOUT_SECONDS,
+    WORKER_MAX_REQUESTS,
+    WORKER_MAX_REQUESTS_JITTER,
+    WORKER_MAX_RSS_MB,
+)
+from src.utils.logging_utils import setup_logging
+from src.utils.process_utils import available_cpus, current_rss_bytes
+
+logger = setup_logging(__name__)
+
+RSS_CHECK_INTERVAL_SECONDS = 5
+# Minimum lifetime before a crashed worker is restarted, to avoid a fork loop
+RESPAWN_BACKOFF_SECONDS = 1
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _watch_rss(server: uvicorn.Server, limit_bytes: int):
+    while not server.should_exit:
+        time.sleep(RSS_CHECK_INTERVAL_SECONDS)
+        rss = current_rss_bytes()
+        if rss > limit_bytes:
+            logger.warning(
+                "Worker %d RSS %.0f MB exceeds limit, recycling",
+                os.getpid(),
+                rss / (1024 * 1024),
+            )
+            server.should_exit = True
+
+
+def _run_worker(app, sock: socket.socket):
+    # Connections inherited from the parent must never be shared across processes
+    from src.utils.db_utils import reset_client
+
+    reset_client()
+    random.seed()
+
+    limit_max_requests = None
+    if WORKER_MAX_REQUESTS > 0:
+        limit_max_requests = WORKER_MAX_REQUESTS + random.randint(
+            0, WORKER_MAX_REQUESTS_JITTER
+        )
+    config = uvicorn.Config(
+        app,
+        limit_max_requests=limit_max_requests,
+        timeout_graceful_shutdown=WORKER_GRACEFUL_TIMEOUT_SECONDS,
+        proxy_headers=True,
+    )
+    server = uvicorn.Server(config)
+    if WORKER_MAX_RSS_MB > 0:
+        threading.Thread(
+            target=_watch_rss,
+            args=(server, WORKER_MAX_RSS_MB * 1024 * 1024),
+            daemon=True,
+        ).start()
+
+    logger.info("Worker %d started", os.getpid())
+    server.run(sockets=[sock])
+
+
+class Arbiter:
+    """Keep a fixed number of forked workers alive until asked to stop."""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children: dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                _run_worker(self.app, self.sock)
+            except Exception:
+                logger.exception("Worker %d crashed", os.getpid())
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = time.monotonic()
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            logger.info("Worker %d exited with code %d, replacing it", pid, code)
+            if time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS)
+            self.spawn()
+
+    def _shutdown(self):
+        logger.info("Stopping %d worker(s)", len(self.children))
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+        deadline = time.monotonic() + WORKER_GRACEFUL_TIMEOUT_SECONDS + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            logger.warning("Worker %d did not stop in time, killing it", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        for _ in range(self.workers):
+            self.spawn()
+        while not self.stopping:
+            self._reap()
+            time.sleep(0.2)
+        self._shutdown()
+
+
+def main():
+    workers = WEB_CONCURRENCY or available_cpus()
+
+    from src.main import app
+    from src.utils.certificate_img_utils import preload_assets
+
+    if not hasattr(os, "fork"):
+        logger.warning("os.fork is unavailable, running a single worker")
+        uvicorn.run(app, host=HOST, port=PORT)
+        return
+
+    sock = _bind_socket(HOST, PORT)
+    # Seed once here: workers seeding in their own lifespans would race each other
+    from src.utils import db_utils
+
+    db_utils.prepare_database()
+    # Close the parent's connections before forking; each worker opens its own
+    db_utils.client.close()
+    db_utils.reset_client()
+    preload_assets()
+    # Move everything loaded so far out of the GC's reach so collections in the
+    # workers don't touch (and thereby un-share) the preloaded pages
+    gc.collect()
+    gc.freeze()
+
+    logger.info("Listening on %s:%d with %d worker(s)", HOST, PORT, workers)
+    Arbiter(app, sock, workers).run()
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Issuance counter keys, shared by the API and certificate-importer.
+
+Only the standard library is imported here so the importer can use it without
+installing the API's dependencies.
+"""
+from collections import Counter
+
+
+def stats_keys(certificate: dict) -> list[tuple[str, str | None]]:
+    """The (dimension, value) counters one certificate adds to.
+
+    A missing field counts under a null value, matching $ifNull in
+    rebuild_certificate_stats.
+    """
+    day = certificate.get("dateIssued")
+    return [
+        ("total", "all"),
+        ("categoryCode", certificate.get("categoryCode")),
+        ("course", certificate.get("course")),
+        ("day", None if day is None else str(day)),
+    ]
+
+
+def count_stats(certificates: list[dict]) -> Counter:
+    """How much each counter grows when these certificates are issued."""
+    return Counter(key for cert in certificates for key in stats_keys(cert))
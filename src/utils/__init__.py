@@ -1,39 +1,151 @@
 from .auth_utils import (
     authenticate_user,
     create_access_token,
+    decode_access_token,
+    get_current_admin,
+    get_current_user,
+    hash_password,
     oauth2_scheme,
     process_login_request,
-    pwd_context,
     verify_password,
 )
+from .cache_utils import (
+    artifact_key,
+    certificate_cache_headers,
+    compute_certificate_etag,
+    etag_matches,
+    format_etag,
+    image_etag,
+)
+from .certificate_svg_utils import SVG_RENDERER_VERSION, generate_certificate_svg
+from .certificate_utils import (
+    fetch_certificate,
+    fetch_verification,
+    get_coalescing_stats,
+    get_degraded_payload,
+    get_hot_report,
+    load_certificate,
+    load_verification,
+    render_admission,
+    render_certificate,
+    render_certificate_image,
+    render_certificate_payload,
+    with_signature_images,
+)
 from .common_utils import generate_credential_id
+from .concurrency_utils import AdmissionController, OverloadedError, SingleFlight
 from .db_utils import (
+    ensure_certificate_stats,
+    ensure_indexes,
     get_certificate_by_credential,
+    get_certificate_for_verification,
+    get_certificate_stats,
+    get_client,
+    get_pool_stats,
+    get_recent_credential_ids,
     get_signatures_by_ids,
     get_user_by_email,
     lifespan,
+    prepare_database,
+    rebuild_certificate_stats,
+    record_certificates_issued,
+    reset_client,
+    search_certificates,
     seed_certificates,
     seed_signatures,
     seed_users,
+    set_client,
+    set_signature_image,
     setup_db,
+    signature_image_digest,
+    sync_signature_digests,
 )
+from .disk_cache_utils import DiskRenderCache, disk_cache
 from .logging_utils import setup_logging
+from .popularity_utils import (
+    CountMinSketch,
+    PopularityTracker,
+    record_certificate_view,
+)
+from .profiling_utils import ProfilingMiddleware, SamplingProfiler
+from .render_cache_utils import RenderCache, render_cache
+from .verification_utils import (
+    build_verification,
+    check_verification,
+    get_public_key_info,
+    signing_configured,
+)
 
 __all__ = [
-    "setup_logging",
-    "setup_db",
-    "seed_signatures",
-    "seed_certificates",
-    "seed_users",
+    "SVG_RENDERER_VERSION",
+    "AdmissionController",
+    "CountMinSketch",
+    "DiskRenderCache",
+    "OverloadedError",
+    "PopularityTracker",
+    "ProfilingMiddleware",
+    "RenderCache",
+    "SamplingProfiler",
+    "SingleFlight",
+    "artifact_key",
+    "authenticate_user",
+    "build_verification",
+    "certificate_cache_headers",
+    "check_verification",
+    "compute_certificate_etag",
+    "create_access_token",
+    "decode_access_token",
+    "disk_cache",
+    "ensure_certificate_stats",
+    "ensure_indexes",
+    "etag_matches",
+    "fetch_certificate",
+    "fetch_verification",
+    "format_etag",
+    "generate_certificate_svg",
+    "generate_credential_id",
     "get_certificate_by_credential",
+    "get_certificate_for_verification",
+    "get_certificate_stats",
+    "get_client",
+    "get_coalescing_stats",
+    "get_current_admin",
+    "get_current_user",
+    "get_degraded_payload",
+    "get_hot_report",
+    "get_pool_stats",
+    "get_public_key_info",
+    "get_recent_credential_ids",
     "get_signatures_by_ids",
     "get_user_by_email",
+    "hash_password",
+    "image_etag",
     "lifespan",
-    "authenticate_user",
-    "create_access_token",
-    "verify_password",
+    "load_certificate",
+    "load_verification",
     "oauth2_scheme",
-    "pwd_context",
+    "prepare_database",
     "process_login_request",
-    "generate_credential_id",
+    "rebuild_certificate_stats",
+    "record_certificate_view",
+    "record_certificates_issued",
+    "render_admission",
+    "render_cache",
+    "render_certificate",
+    "render_certificate_image",
+    "render_certificate_payload",
+    "reset_client",
+    "search_certificates",
+    "seed_certificates",
+    "seed_signatures",
+    "seed_users",
+    "set_client",
+    "set_signature_image",
+    "setup_db",
+    "setup_logging",
+    "signature_image_digest",
+    "signing_configured",
+    "sync_signature_digests",
+    "verify_password",
+    "with_signature_images",
 ]
@@ -1,20 +1,34 @@
 from datetime import datetime, timedelta, timezone
+from typing import Annotated
 
-from fastapi import HTTPException, Request
+import bcrypt
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
-from passlib.context import CryptContext
+from jose import JWTError, jwt
 
 from src.config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
 from src.utils.db_utils import get_user_by_email
 from src.utils.logging_utils import setup_logging
 
 logger = setup_logging(__name__)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# bcrypt only uses the first 72 bytes of a password. passlib truncated longer ones
+# silently, bcrypt 5 raises instead, so truncate here to keep existing hashes valid.
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt()).decode("ascii")
 
 def verify_password(plain_password, hashed_password):
-    result = pwd_context.verify(plain_password, hashed_password)
+    # bcrypt is used directly: passlib 1.7.4 fails its backend self-test on bcrypt 5
+    try:
+        result = bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("utf-8"))
+    except ValueError:
+        logger.warning("Stored password is not a valid bcrypt hash")
+        result = False
     logger.info("Password verification result: %s", result)
     return result
 
@@ -26,6 +40,29 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     logger.info("JWT created for sub: %s, role: %s", to_encode.get("sub"), to_encode.get("role"))
     return token
 
+def decode_access_token(token: str) -> dict | None:
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        logger.warning("Rejected invalid or expired access token")
+        return None
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    payload = decode_access_token(token)
+    if not payload:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+def get_current_admin(user: Annotated[dict, Depends(get_current_user)]) -> dict:
+    if user.get("role") != "admin":
+        logger.warning("Admin access denied for sub: %s", user.get("sub"))
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return user
+
 def authenticate_user(email: str, password: str):
     logger.info("Authenticating user with email: %s", email)
     user = get_user_by_email(email)
@@ -0,0 +1,75 @@
+import hashlib
+import json
+
+from src.config import (
+    CERTIFICATE_CACHE_MAX_AGE,
+    CERTIFICATE_CACHE_STALE_WHILE_REVALIDATE,
+)
+from src.utils.certificate_img_utils import RENDERER_VERSION, get_certificate_style
+from src.utils.certificate_svg_utils import SVG_RENDERER_VERSION
+
+# Version of the renderer behind each output format of the certificate endpoint
+FORMAT_RENDERER_VERSIONS = {"svg": SVG_RENDERER_VERSION}
+
+
+def compute_certificate_etag(cert_doc: dict) -> str:
+    """Build a strong ETag from the stored certificate and how it will be rendered.
+
+    The digest covers the certificate document with its signature documents, the
+    renderer version and the style selected for its categoryCode, so any change that
+    would alter the response produces a new validator. Signatures are passed without
+    their images (see load_certificate) so the hash stays cheap; their imageDigest
+    covers the image instead (see set_signature_image and sync_signature_digests).
+    """
+    style = get_certificate_style(cert_doc.get("categoryCode") or "PART")
+    payload = json.dumps(
+        {"doc": cert_doc, "renderer": RENDERER_VERSION, "style": style},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def format_etag(etag: str, fmt: str) -> str:
+    """Derive the ETag of a certificate rendered in a format other than PNG.
+
+    The same document yields a different body per format, so each representation
+    needs its own validator; the format's renderer version is folded in as well.
+    """
+    if fmt == "png":
+        return etag
+    return f'"{etag.strip(chr(34))}-{fmt}{FORMAT_RENDERER_VERSIONS[fmt]}"'
+
+
+def artifact_key(etag: str, fmt: str) -> str:
+    """Content address of a rendered image in the shared disk cache.
+
+    Derived from the certificate ETag, which already covers the document, renderer
+    version and style, plus the format's own renderer version.
+    """
+    return format_etag(etag, fmt).strip('"')
+
+
+def image_etag(etag: str, fmt: str) -> str:
+    """ETag of the bare image representation (no JSON wrapping) in format fmt."""
+    return f'"{format_etag(etag, fmt).strip(chr(34))}-image"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Evaluate an If-None-Match header against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def certificate_cache_headers(etag: str) -> dict[str, str]:
+    cache_control = (
+        f"public, max-age={CERTIFICATE_CACHE_MAX_AGE}, "
+        f"stale-while-revalidate={CERTIFICATE_CACHE_STALE_WHILE_REVALIDATE}"
+    )
+    return {"ETag": etag, "Cache-Control": cache_control}
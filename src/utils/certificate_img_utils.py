@@ -1,7 +1,114 @@
+import base64
+import hashlib
 import io
+import logging
+import os
+import threading
+from functools import cache
 
 from PIL import Image, ImageDraw, ImageFont
 
+# Bump whenever a change to this module alters the rendered output, so cached
+# renders and HTTP validators (ETags) derived from it are invalidated.
+RENDERER_VERSION = "1"
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), "../assets")
+FONT_DIR = os.path.join(ASSETS_DIR, "fonts")
+LOGO_WIDTH = 140
+# Font sizes used by the layout, keyed by the label used in log messages
+FONT_SIZES = {
+    "title": 28,
+    "subtitle": 12,
+    "name": 40,
+    "body": 13,
+    "signature name": 11,
+    "signature post": 10,
+}
+
+font_logger = logging.getLogger("certify.font")
+
+
+# Fonts and the logo are loaded once per process and reused by every render.
+# preload_assets() loads them up front, e.g. in a pre-fork parent process so the
+# workers share them copy-on-write.
+@cache
+def load_font(font_name, size, label=None):
+    """Load a font, trying the given name, then bundled DejaVuSans, then default."""
+    try:
+        font_logger.info(f"Trying to load font '{font_name}' for {label or font_name} at size {size}")
+        f = ImageFont.truetype(font_name, size)
+        font_logger.info(f"Loaded font '{font_name}' for {label or font_name}")
+        return f
+    except IOError:
+        try:
+            bundled = os.path.join(FONT_DIR, "DejaVuSans.ttf")
+            font_logger.warning(f"Font '{font_name}' not found for {label or font_name}, trying fallback '{bundled}'")
+            f = ImageFont.truetype(bundled, size)
+            font_logger.info(f"Loaded fallback font '{bundled}' for {label or font_name}")
+            return f
+        except IOError:
+            font_logger.error(f"Font not found: {font_name} and fallback '{bundled}' failed for {label or font_name}, using default.")
+            return ImageFont.load_default()
+
+
+@cache
+def load_logo(logo_width=LOGO_WIDTH):
+    """Load the club logo as RGBA, resized to logo_width keeping its aspect ratio."""
+    logo_path = os.path.join(ASSETS_DIR, "sliitmozilla-logo.png")
+    with Image.open(logo_path) as source:
+        logo = source.convert("RGBA")
+    logo_height = int(logo.size[1] * (logo_width / logo.size[0]))
+    return logo.resize((logo_width, logo_height), Image.LANCZOS)
+
+
+def preload_assets():
+    for label, size in FONT_SIZES.items():
+        load_font("arial.ttf", size, label)
+    try:
+        load_logo()
+    except OSError as e:
+        font_logger.error(f"Could not preload logo: {e}")
+
+# Decoded signatures, resized for drawing, keyed by signature_key() and size.
+# Stored signatures are often full-resolution scans, so decoding one costs far more
+# memory than the whole certificate canvas; each is decoded only once. Renders run
+# in threadpool threads, so the cache is guarded by a lock.
+SIGNATURE_CACHE_SIZE = 64
+SIGNATURE_KEY_CHUNK = 64 * 1024
+_signature_images = {}
+_signature_images_lock = threading.Lock()
+
+
+def signature_key(image_b64):
+    """Key for caches of images derived from a stored signature.
+
+    A BLAKE2b digest of the base64 text, fed in chunks so keying never copies the
+    whole blob, and the cache never keeps the blob alive.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for start in range(0, len(image_b64), SIGNATURE_KEY_CHUNK):
+        digest.update(image_b64[start:start + SIGNATURE_KEY_CHUNK].encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_signature_image(image_b64, size):
+    """Decode a base64 (optionally data URI) signature as RGBA resized to size."""
+    key = (signature_key(image_b64), tuple(size))
+    with _signature_images_lock:
+        image = _signature_images.get(key)
+    if image is None:
+        if ',' in image_b64 and image_b64.startswith('data:'):
+            image_b64 = image_b64.split(',', 1)[1]
+        data = base64.b64decode(image_b64 + '=' * (-len(image_b64) % 4))
+        with Image.open(io.BytesIO(data)) as source:
+            image = source.convert("RGBA").resize(tuple(size), Image.LANCZOS)
+        del data
+        with _signature_images_lock:
+            if len(_signature_images) >= SIGNATURE_CACHE_SIZE:
+                _signature_images.pop(next(iter(_signature_images)), None)
+            _signature_images[key] = image
+    return image
+
 
 # Category-based style configuration
 def get_certificate_style(category_code: str):
@@ -156,8 +263,11 @@ def get_certificate_style(category_code: str):
     default_style = styles.get("HOLAMOZILLA2025")
     return styles.get(category_code.upper(), default_style)
 
-def generate_certificate_image(cert):
-    import os
+def draw_certificate(cert):
+    """Draw the certificate onto a new RGB canvas and return it.
+
+    The caller owns the canvas and should close it once encoded.
+    """
     # Style selection based on categoryCode
     style = get_certificate_style(getattr(cert, 'categoryCode', 'PART'))
     # Create a blank themed image using style-provided dimensions if available
@@ -190,12 +300,9 @@ def generate_certificate_image(cert):
     element_spacing = style.get("element_spacing", 80)
     
     # Load and paste logo
-    logo_path = os.path.join(os.path.dirname(__file__), "../assets/sliitmozilla-logo.png")
     try:
-        logo = Image.open(logo_path).convert("RGBA")
-        logo_width = 140
-        logo_height = int(logo.size[1] * (logo_width / logo.size[0]))
-        logo = logo.resize((logo_width, logo_height), Image.LANCZOS)
+        logo = load_logo()
+        logo_width, logo_height = logo.size
         logo_top = 60  # vertical starting point for logo
         title_top_padding = 30  # extra space between logo bottom and title text
         image.paste(logo, (width // 2 - logo_width // 2, logo_top), logo)
@@ -206,26 +313,6 @@ def generate_certificate_image(cert):
         title_y = 100  # include assumed padding
 
     # Load fonts robustly: try arial.ttf, then bundled DejaVuSans, then default
-    font_dir = os.path.join(os.path.dirname(__file__), "../assets/fonts")
-    import logging
-    font_logger = logging.getLogger("certify.font")
-    def load_font(font_name, size, label=None):
-        try:
-            font_logger.info(f"Trying to load font '{font_name}' for {label or font_name} at size {size}")
-            f = ImageFont.truetype(font_name, size)
-            font_logger.info(f"Loaded font '{font_name}' for {label or font_name}")
-            return f
-        except IOError:
-            try:
-                bundled = os.path.join(font_dir, "DejaVuSans.ttf")
-                font_logger.warning(f"Font '{font_name}' not found for {label or font_name}, trying fallback '{bundled}'")
-                f = ImageFont.truetype(bundled, size)
-                font_logger.info(f"Loaded fallback font '{bundled}' for {label or font_name}")
-                return f
-            except IOError:
-                font_logger.error(f"Font not found: {font_name} and fallback '{bundled}' failed for {label or font_name}, using default.")
-                return ImageFont.load_default()
-
     font_title = load_font("arial.ttf", 28, "title")
     font_subtitle = load_font("arial.ttf", 12, "subtitle")
     font_name = load_font("arial.ttf", 40, "name")
@@ -302,7 +389,6 @@ def generate_certificate_image(cert):
     sig_post_h = draw.textbbox((0, 0), "Ag", font=font_sig_post)[3] - draw.textbbox((0, 0), "Ag", font=font_sig_post)[1]
 
     # Draw signatures (base64 images) with debug logging - equal spacing from event text
-    import logging
     logger = logging.getLogger("certify.signature")
     signatures = getattr(cert, 'signatures', [])
     logger.info(f"Signature count: {len(signatures)}")
@@ -335,15 +421,6 @@ def generate_certificate_image(cert):
     # Now that sig_y potentially shifted, compute seal_y: align seal CENTER with signature images row
     seal_y = sig_y + sig_img_size[1] // 2  # center vertically in the signature image row
 
-    def fix_base64_padding(b64_string):
-        return b64_string + '=' * (-len(b64_string) % 4)
-    
-    def strip_data_uri(b64_string):
-        """Remove data URI prefix like 'data:image/png;base64,' from base64 string"""
-        if ',' in b64_string and b64_string.startswith('data:'):
-            return b64_string.split(',', 1)[1]
-        return b64_string
-
     # Draw yellow circular seal (after potential shift) centered between signatures in the SAME ROW
     seal_color = style.get("seal_color", (255, 193, 7))
     outline_color = (
@@ -366,11 +443,7 @@ def generate_certificate_image(cert):
         logger.info(f"Left signature: {signatures[0].name}, has image: {bool(signatures[0].image_b64)}")
         logger.info(f"Left signature base64 starts: {signatures[0].image_b64[:30]}")
         try:
-            import base64
-            from io import BytesIO
-            clean_b64 = strip_data_uri(signatures[0].image_b64)
-            sig_img_data = base64.b64decode(fix_base64_padding(clean_b64))
-            sig_img = Image.open(BytesIO(sig_img_data)).convert("RGBA").resize(sig_img_size, Image.LANCZOS)
+            sig_img = load_signature_image(signatures[0].image_b64, sig_img_size)
             image.paste(sig_img, (sig_x_left, sig_y), sig_img)
         except Exception as e:
             logger.error(f"Error loading left signature image: {e}")
@@ -394,9 +467,7 @@ def generate_certificate_image(cert):
         logger.info(f"Right signature: {signatures[1].name}, has image: {bool(signatures[1].image_b64)}")
         logger.info(f"Right signature base64 starts: {signatures[1].image_b64[:30]}")
         try:
-            clean_b64 = strip_data_uri(signatures[1].image_b64)
-            sig_img_data = base64.b64decode(fix_base64_padding(clean_b64))
-            sig_img = Image.open(BytesIO(sig_img_data)).convert("RGBA").resize(sig_img_size, Image.LANCZOS)
+            sig_img = load_signature_image(signatures[1].image_b64, sig_img_size)
             image.paste(sig_img, (sig_x_right, sig_y), sig_img)
         except Exception as e:
             logger.error(f"Error loading right signature image: {e}")
@@ -424,9 +495,26 @@ def generate_certificate_image(cert):
     date_width = date_bbox_final[2] - date_bbox_final[0]
     draw.text((seal_center_x - date_width // 2, date_y), date_str, font=font_body, fill="black")
 
-    # Save image to bytes
+    return image
+
+
+def write_certificate_png(cert, fp):
+    """Render the certificate and encode it as PNG straight into the file object fp.
+
+    The canvas is released as soon as it has been encoded, so only the encoded
+    bytes outlive the call.
+    """
+    image = draw_certificate(cert)
+    try:
+        image.save(fp, format="PNG")
+    finally:
+        image.close()
+
+
+def generate_certificate_image(cert):
+    """Render the certificate as a base64-encoded PNG."""
     img_bytes = io.BytesIO()
-    image.save(img_bytes, format="PNG")
-    img_bytes.seek(0)
-    img_b64 = base64.b64encode(img_bytes.read()).decode("utf-8")
-    return img_b64
+    write_certificate_png(cert, img_bytes)
+    # Encode from the buffer itself rather than a copy read out of it
+    with img_bytes.getbuffer() as view:
+        return base64.b64encode(view).decode("utf-8")
@@ -0,0 +1,254 @@
+import base64
+import io
+import logging
+import threading
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+from src.utils.certificate_img_utils import (
+    FONT_SIZES,
+    SIGNATURE_CACHE_SIZE,
+    get_certificate_style,
+    load_font,
+    load_logo,
+    load_signature_image,
+    signature_key,
+)
+
+logger = logging.getLogger("certify.signature")
+
+# Bump whenever a change to this module alters the generated SVG
+SVG_RENDERER_VERSION = "2"
+
+FONT_FAMILY = "'DejaVu Sans', Arial, sans-serif"
+
+
+def _font(label):
+    return load_font("arial.ttf", FONT_SIZES[label], label)
+
+
+def _text_width(text, font):
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0]
+
+
+def _text_height(text, font):
+    bbox = font.getbbox(text)
+    return bbox[3] - bbox[1]
+
+
+def _rgb(color):
+    if isinstance(color, str):
+        return color
+    red, green, blue = color[:3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def _centered_text(center_x, y, text, label):
+    """SVG text centred on center_x with its top at y, as ImageDraw.text draws it.
+
+    SVG places text on its baseline, so the font ascent is added to y. Centring is
+    left to the viewer (text-anchor) so it holds even if a substitute font is used.
+    """
+    baseline = y + _font(label).getmetrics()[0]
+    return (
+        f'<text x="{center_x}" y="{baseline}" text-anchor="middle" '
+        f'font-size="{FONT_SIZES[label]}">{escape(text)}</text>'
+    )
+
+
+def _png_data_uri(image, colors):
+    """Encode an RGBA image as a palette PNG data URI.
+
+    The logo and signatures use only a handful of colours, so quantising them to a
+    small palette shrinks the embedded PNG several times over without visible loss.
+    """
+    buffer = io.BytesIO()
+    image.quantize(colors=colors, method=Image.FASTOCTREE).save(
+        buffer, format="PNG", optimize=True
+    )
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+@lru_cache(maxsize=1)
+def _logo_data_uri():
+    """The resized logo as a data URI, encoded once per process."""
+    return _png_data_uri(load_logo(), 32)
+
+
+_signature_uris = {}
+_signature_uris_lock = threading.Lock()
+
+
+def _signature_data_uri(image_b64, size):
+    """A stored signature downscaled to twice its drawn size as a PNG data URI.
+
+    Uploaded signatures are often full-resolution scans several hundred KB in size;
+    embedding them verbatim would make every SVG far larger than the PNG render.
+    Twice the drawn size keeps them crisp when printed. Cached per signature.
+    """
+    key = (signature_key(image_b64), size)
+    with _signature_uris_lock:
+        uri = _signature_uris.get(key)
+    if uri is None:
+        image = load_signature_image(image_b64, (size[0] * 2, size[1] * 2))
+        uri = _png_data_uri(image, 16)
+        with _signature_uris_lock:
+            if len(_signature_uris) >= SIGNATURE_CACHE_SIZE:
+                _signature_uris.pop(next(iter(_signature_uris)), None)
+            _signature_uris[key] = uri
+    return uri
+
+
+def generate_certificate_svg(cert):
+    """Render the certificate as an SVG document.
+
+    Mirrors the layout of generate_certificate_image (same style, fonts, positions
+    and wrapping) but emits vector shapes and text, so the result is resolution
+    independent and there is no canvas to rasterise or PNG to encode. The logo and
+    each distinct signature are embedded once as small, compressed data URIs;
+    signers sharing a signature image reference the same <defs> entry with <use>.
+    """
+    style = get_certificate_style(getattr(cert, 'categoryCode', 'PART'))
+    width = style.get("width", 900)
+    height = style.get("height", 600)
+    element_spacing = style.get("element_spacing", 80)
+    border_height = 15
+    defs = [
+        (
+            '<linearGradient id="border" x1="0" y1="0" x2="0" y2="1">'
+            f'<stop offset="0" stop-color="{_rgb(style["gradient_start"])}"/>'
+            f'<stop offset="1" stop-color="{_rgb(style["gradient_end"])}"/>'
+            '</linearGradient>'
+        ),
+    ]
+    parts = [
+        (
+            f'<rect width="{width}" height="{height}" '
+            f'fill="{_rgb(style.get("background", (255, 255, 255)))}"/>'
+        ),
+        f'<rect width="{width}" height="{border_height}" fill="url(#border)"/>',
+        (
+            f'<rect y="{height - border_height}" width="{width}" '
+            f'height="{border_height}" fill="url(#border)"/>'
+        ),
+    ]
+
+    # Logo
+    try:
+        logo_width, logo_height = load_logo().size
+        logo_top = 60
+        parts.append(
+            f'<image x="{width // 2 - logo_width // 2}" y="{logo_top}" '
+            f'width="{logo_width}" height="{logo_height}" '
+            f'xlink:href="{_logo_data_uri()}"/>'
+        )
+        title_y = logo_top + logo_height + 30
+    except OSError:
+        title_y = 100
+
+    # Title, subtitle and recipient name, each centred
+    dynamic_title = f"{getattr(cert, 'categoryName', getattr(cert, 'categoryCode', 'PARTICIPATION')).upper()}"
+    title_text = style.get("title") or dynamic_title
+    parts.append(_centered_text(width // 2, title_y, title_text, "title"))
+
+    subtitle_y = title_y + element_spacing
+    subtitle_text = "We are proudly presenting this to"
+    parts.append(_centered_text(width // 2, subtitle_y, subtitle_text, "subtitle"))
+
+    name_y = subtitle_y + element_spacing
+    parts.append(_centered_text(width // 2, name_y, cert.name, "name"))
+
+    # Event description, wrapped to width - 300 like the raster renderer
+    event_y = name_y + element_spacing + style.get("event_extra_padding", 20)
+    course = getattr(cert, 'course', 'the event')
+    event_text = f"This is to certify that {cert.name} {course}."
+    font_body = _font("body")
+    max_line_width = width - 300
+    if _text_width(event_text, font_body) > max_line_width:
+        lines = []
+        current_line = []
+        for word in event_text.split():
+            test_line = ' '.join(current_line + [word])
+            if _text_width(test_line, font_body) < max_line_width:
+                current_line.append(word)
+            else:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+        lines.append(' '.join(current_line))
+    else:
+        lines = [event_text]
+    for i, line in enumerate(lines):
+        parts.append(_centered_text(width // 2, event_y + 20 * i, line, "body"))
+
+    # Vertical balancing of the signature/seal block (see generate_certificate_image)
+    date_str = str(cert.dateIssued)
+    date_height = _text_height(date_str, font_body)
+    sig_name_h = _text_height("Ag", _font("signature name"))
+    sig_post_h = _text_height("Ag", _font("signature post"))
+    sig_y = event_y + style.get("event_bottom_spacing", element_spacing + 40)
+    sig_img_size = style.get("sig_img_size", (100, 42))
+    seal_radius = 22
+    seal_center_x = width // 2
+    signature_block_h = sig_img_size[1] + 5 + 1 + 5 + sig_name_h + 5 + sig_post_h
+    seal_block_h = seal_radius * 2 + 12 + date_height
+    projected_bottom = sig_y + signature_block_h + element_spacing + seal_block_h
+    extra_space = (height - projected_bottom) - 140
+    if extra_space > 0:
+        sig_y += extra_space // 2
+    seal_y = sig_y + sig_img_size[1] // 2
+
+    # Seal
+    seal_color = style.get("seal_color", (255, 193, 7))
+    outline_color = tuple(max(0, c - 35) for c in seal_color[:3])
+    parts.append(
+        f'<circle cx="{seal_center_x}" cy="{seal_y}" r="{seal_radius}" '
+        f'fill="{_rgb(seal_color)}" stroke="{_rgb(outline_color)}" stroke-width="2"/>'
+    )
+
+    # Signatures: image, line, then centred name and post
+    lowest = sig_y + sig_img_size[1]
+    signatures = getattr(cert, 'signatures', [])
+    signature_ids = {}
+    for sig, sig_x in zip(signatures[:2], (120, width - 220)):
+        href = None
+        if sig.image_b64:
+            try:
+                href = _signature_data_uri(sig.image_b64, tuple(sig_img_size))
+            # Bad base64 (binascii.Error is a ValueError) or an unreadable image
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading signature image for {sig.name}: {e}")
+        if href:
+            if href not in signature_ids:
+                signature_ids[href] = f"signature-{len(signature_ids)}"
+                defs.append(
+                    f'<image id="{signature_ids[href]}" width="{sig_img_size[0]}" '
+                    f'height="{sig_img_size[1]}" preserveAspectRatio="none" '
+                    f'xlink:href="{href}"/>'
+                )
+            parts.append(
+                f'<use x="{sig_x}" y="{sig_y}" xlink:href="#{signature_ids[href]}"/>'
+            )
+        line_y = sig_y + sig_img_size[1] + 5
+        parts.append(
+            f'<line x1="{sig_x}" y1="{line_y + 0.5}" x2="{sig_x + sig_img_size[0]}" '
+            f'y2="{line_y + 0.5}" stroke="#000000" stroke-width="1"/>'
+        )
+        sig_center_x = sig_x + sig_img_size[0] // 2
+        parts.append(_centered_text(sig_center_x, line_y + 5, sig.name, "signature name"))
+        parts.append(_centered_text(sig_center_x, line_y + 23, sig.post, "signature post"))
+        lowest = max(lowest, line_y + 23 + _text_height(sig.post, _font("signature post")))
+
+    # Date centred below the signature block
+    date_y = lowest + 28
+    parts.append(_centered_text(seal_center_x, date_y, date_str, "body"))
+
+    header = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" '
+        f'xmlns:xlink="http://www.w3.org/1999/xlink" width="{width}" '
+        f'height="{height}" viewBox="0 0 {width} {height}" '
+        f'font-family="{FONT_FAMILY}">'
+    )
+    return "".join([header, "<defs>", *defs, "</defs>", *parts, "</svg>"])
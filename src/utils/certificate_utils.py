@@ -0,0 +1,302 @@
+import asyncio
+import base64
+import io
+
+from pydantic_core import to_json
+from pymongo.errors import PyMongoError
+
+from src.config import (
+    PREWARM_ENABLED,
+    PREWARM_HOT_COUNT,
+    PREWARM_INTERVAL_SECONDS,
+    PREWARM_RECENT_COUNT,
+    RENDER_DEADLINE_SECONDS,
+    RENDER_MAX_CONCURRENCY,
+    RENDER_MAX_QUEUE,
+)
+from src.models import Certificate
+from src.utils.cache_utils import artifact_key, compute_certificate_etag
+from src.utils.certificate_img_utils import write_certificate_png
+from src.utils.certificate_svg_utils import generate_certificate_svg
+from src.utils.concurrency_utils import (
+    AdmissionController,
+    OverloadedError,
+    SingleFlight,
+)
+from src.utils.db_utils import (
+    get_certificate_by_credential,
+    get_certificate_for_verification,
+    get_recent_credential_ids,
+    get_signatures_by_ids,
+)
+from src.utils.disk_cache_utils import disk_cache
+from src.utils.logging_utils import setup_logging
+from src.utils.popularity_utils import (
+    category_popularity,
+    credential_popularity,
+)
+from src.utils.profiling_utils import run_in_threadpool
+from src.utils.render_cache_utils import render_cache
+from src.utils.verification_utils import build_verification
+
+logger = setup_logging(__name__)
+
+# Identical concurrent requests share one Mongo fetch (keyed by credential ID) and
+# one render (keyed by ETag, i.e. by the exact content being rendered).
+certificate_loads = SingleFlight("certificate_load")
+certificate_renders = SingleFlight("certificate_render")
+certificate_verifications = SingleFlight("certificate_verify")
+# Bounds how many renders (each holding a full canvas and PNG buffers) run at once
+render_admission = AdmissionController(
+    "certificate_render",
+    max_concurrent=RENDER_MAX_CONCURRENCY,
+    max_queue=RENDER_MAX_QUEUE,
+    timeout=RENDER_DEADLINE_SECONDS,
+)
+
+
+def load_certificate(credential_id: str) -> tuple[dict, str] | None:
+    """Fetch a certificate with its signature metadata and compute its ETag.
+
+    Signature images are not loaded: the ETag covers the signature documents
+    without them, so revalidations and cache hits never read the blobs. Use
+    with_signature_images before rendering.
+    """
+    cert_doc = get_certificate_by_credential(credential_id)
+    if not cert_doc:
+        return None
+    cert_doc["signatures"] = get_signatures_by_ids(
+        cert_doc.get("signatures", []), include_images=False
+    )
+    return cert_doc, compute_certificate_etag(cert_doc)
+
+
+def with_signature_images(cert_doc: dict) -> dict:
+    """A copy of a loaded certificate with its signatures' images resolved."""
+    signature_ids = [signature["id"] for signature in cert_doc.get("signatures", [])]
+    return {**cert_doc, "signatures": get_signatures_by_ids(signature_ids)}
+
+
+def _draw_image(cert: Certificate, fmt: str) -> bytes:
+    if fmt == "svg":
+        return generate_certificate_svg(cert).encode("utf-8")
+    buffer = io.BytesIO()
+    write_certificate_png(cert, buffer)
+    return buffer.getvalue()
+
+
+def render_certificate(
+    cert_doc: dict, fmt: str = "png", image: bytes | None = None
+) -> bytes:
+    """Render a loaded certificate into the serialized JSON API payload.
+
+    The payload holds all certificate fields plus either image_b64 (a PNG) or, for
+    fmt="svg", image_svg (the SVG document as text). It is serialized once, straight
+    to bytes, so cache hits are served without another encoding pass. Pass image,
+    the certificate already rendered in fmt, to skip drawing it again.
+    """
+    cert = Certificate(**cert_doc)
+    if image is None:
+        image = _draw_image(cert, fmt)
+    cert_dict = cert.dict(by_alias=True)
+    if fmt == "svg":
+        cert_dict["image_svg"] = str(image, "utf-8")
+    else:
+        cert_dict["image_b64"] = base64.b64encode(image).decode("utf-8")
+    return to_json(cert_dict)
+
+
+def render_certificate_image(cert_doc: dict, fmt: str = "png") -> bytes:
+    """Render a loaded certificate as the bare image, with no base64 or JSON wrapping."""
+    return _draw_image(Certificate(**cert_doc), fmt)
+
+
+def _render_artifact(cert_doc: dict, fmt: str, artifact: str | None) -> bytes:
+    image = render_certificate_image(cert_doc, fmt)
+    if artifact:
+        disk_cache.write(artifact, fmt, image)
+    return image
+
+
+def _render_cache_key(credential_id: str, fmt: str, image: bool = False) -> str:
+    # PNG keeps the bare credential ID so hot/prewarm lookups stay unchanged
+    key = credential_id if fmt == "png" else f"{credential_id}.{fmt}"
+    return f"{key}.image" if image else key
+
+
+async def fetch_certificate(credential_id: str) -> tuple[dict, str] | None:
+    return await certificate_loads.do(
+        credential_id, lambda: run_in_threadpool(load_certificate, credential_id)
+    )
+
+
+def load_verification(credential_id: str) -> tuple[bytes, str] | None:
+    """The serialized /verify body for a credential and its ETag (digest and key)."""
+    cert_doc = get_certificate_for_verification(credential_id)
+    if not cert_doc:
+        return None
+    payload = build_verification(cert_doc)
+    # The body also depends on the signing key, so a rotated key changes the ETag
+    digest = payload["digest"].removeprefix("sha256:")
+    return to_json(payload), f'"{digest[:24]}-{payload["keyId"][:8]}"'
+
+
+async def fetch_verification(credential_id: str) -> tuple[bytes, str] | None:
+    return await certificate_verifications.do(
+        credential_id, lambda: run_in_threadpool(load_verification, credential_id)
+    )
+
+
+async def _render_and_cache(
+    cert_doc: dict,
+    etag: str,
+    deadline: float | None,
+    fmt: str,
+    image: bool,
+    artifact: str | None,
+) -> bytes:
+    # Bare images already on disk are served by path (see serve_certificate), so
+    # only the JSON payload reads the artifact back
+    data = None
+    if artifact and not image:
+        data = await run_in_threadpool(disk_cache.read, artifact, fmt)
+    # Drawing the image and the JSON payload both need the signature images
+    cert_doc = await run_in_threadpool(with_signature_images, cert_doc)
+    if data is None:
+        async with render_admission.admit(deadline):
+            data = await run_in_threadpool(_render_artifact, cert_doc, fmt, artifact)
+    payload = data if image else await run_in_threadpool(render_certificate, cert_doc, fmt, data)
+    render_cache.put(_render_cache_key(cert_doc["credentialId"], fmt, image), etag, payload)
+    return payload
+
+
+async def render_certificate_payload(
+    cert_doc: dict,
+    etag: str,
+    deadline: float | None = None,
+    fmt: str = "png",
+    image: bool = False,
+    artifact: str | None = None,
+) -> bytes:
+    """Return the rendered body from cache or render it under admission control.
+
+    The body is the JSON payload, or with image=True the bare image. etag must be
+    the validator of that representation (see format_etag and image_etag). With
+    artifact (see artifact_key) a drawn image is stored to the shared disk cache,
+    and the JSON payload reuses the image stored there instead of drawing it; look
+    bare images up on disk before calling this. Raises OverloadedError when no
+    render slot frees up before the deadline.
+    """
+    cached = render_cache.get(etag)
+    if cached is not None:
+        return cached
+    return await certificate_renders.do(
+        etag, lambda: _render_and_cache(cert_doc, etag, deadline, fmt, image, artifact)
+    )
+
+
+def get_degraded_payload(
+    credential_id: str, fmt: str = "png", image: bool = False
+) -> bytes | None:
+    """A previously rendered body to serve when a fresh render is shed."""
+    payload = render_cache.latest_for(_render_cache_key(credential_id, fmt, image))
+    if payload is not None:
+        render_admission.record_degraded()
+    return payload
+
+
+def get_coalescing_stats() -> dict:
+    return {
+        "certificate_load": certificate_loads.stats(),
+        "certificate_render": certificate_renders.stats(),
+        "certificate_verify": certificate_verifications.stats(),
+    }
+
+
+def _is_idle() -> bool:
+    return not certificate_loads.stats()["in_flight"] and not (
+        certificate_renders.stats()["in_flight"]
+    )
+
+
+async def prewarm_once() -> int:
+    """Render the hottest and newest certificates that are not cached yet.
+
+    Stops as soon as real requests are being served so prewarming only ever uses
+    idle time. Returns the number of certificates rendered.
+    """
+    hot = [key for key, _ in credential_popularity.hottest(PREWARM_HOT_COUNT)]
+    recent = await run_in_threadpool(get_recent_credential_ids, PREWARM_RECENT_COUNT)
+    rendered = 0
+    for credential_id in dict.fromkeys(hot + recent):
+        if render_cache.contains_credential(credential_id):
+            continue
+        if not _is_idle():
+            break
+        loaded = await fetch_certificate(credential_id)
+        if not loaded:
+            continue
+        cert_doc, etag = loaded
+        if etag not in render_cache:
+            try:
+                await render_certificate_payload(
+                    cert_doc, etag, artifact=artifact_key(etag, "png")
+                )
+            except OverloadedError:
+                break
+            rendered += 1
+    return rendered
+
+
+async def _prewarm_loop():
+    while True:
+        await asyncio.sleep(PREWARM_INTERVAL_SECONDS)
+        try:
+            rendered = await prewarm_once()
+            if rendered:
+                logger.info("Prewarmed %d certificate render(s)", rendered)
+        # Database errors, or a certificate whose data or images cannot be drawn
+        except (PyMongoError, OSError, ValueError) as e:
+            logger.error("Certificate prewarming failed: %s", e)
+
+
+_prewarm_task: asyncio.Task | None = None
+
+
+def start_prewarming():
+    global _prewarm_task
+    if PREWARM_ENABLED and _prewarm_task is None:
+        _prewarm_task = asyncio.create_task(_prewarm_loop())
+
+
+async def stop_prewarming():
+    global _prewarm_task
+    if _prewarm_task is not None:
+        _prewarm_task.cancel()
+        try:
+            await _prewarm_task
+        except asyncio.CancelledError:
+            pass
+        _prewarm_task = None
+
+
+def get_hot_report(limit: int = PREWARM_HOT_COUNT) -> dict:
+    hot = credential_popularity.hottest(limit)
+    credentials = [
+        {
+            "credentialId": key,
+            "views": views,
+            "cached": render_cache.contains_credential(key),
+        }
+        for key, views in hot
+    ]
+    cached = sum(1 for item in credentials if item["cached"])
+    return {
+        "credentials": credentials,
+        "categories": [
+            {"categoryCode": key, "views": views}
+            for key, views in category_popularity.hottest()
+        ],
+        "coverage": cached / len(credentials) if credentials else 1.0,
+        "cache": render_cache.stats(),
+    }
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from src.utils.logging_utils import setup_logging
+
+logger = setup_logging(__name__)
+
+
+class OverloadedError(Exception):
+    """Raised when admission control sheds a request instead of queueing it."""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) starts the work as its own task; callers
+    arriving while it is in flight await that same task instead of repeating it.
+    The work is shielded, so a cancelled caller (e.g. a client that disconnected)
+    neither cancels it for the others nor leaves them without a result. Errors are
+    delivered to every waiter and the key is released, so the next call retries.
+    OverloadedError is load shedding rather than a failure, so it is passed on
+    without being logged or counted in errors.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the outcome so an error nobody awaited anymore is still logged once
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and not isinstance(error, OverloadedError):
+            self.errors += 1
+            logger.error("%s failed for key %s: %s", self.name, key, error)
+
+    def stats(self) -> dict:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+        }
+
+
+class AdmissionController:
+    """Bound concurrent work with a short FIFO wait queue and per-request deadlines.
+
+    Unlike a bare semaphore, waiting is bounded twice: when the queue is full a new
+    request is rejected immediately, and a queued request gives up once its deadline
+    passes. Either way OverloadedError is raised so the caller can fail fast.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.degraded = 0
+
+    @asynccontextmanager
+    async def admit(self, deadline: float | None = None) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block.
+
+        deadline is a time.monotonic() timestamp; without one the controller's
+        default timeout applies from now.
+        """
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+        else:
+            await self._wait_for_slot(deadline)
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _wait_for_slot(self, deadline: float | None):
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(f"{self.name} queue is full")
+
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait({waiter}, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.CancelledError:
+            # A slot handed over just before cancellation must be passed on
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        if not waiter.done():
+            waiter.cancel()
+            self.timed_out += 1
+            raise OverloadedError(f"{self.name} deadline exceeded while queued")
+
+    def _release(self):
+        # Hand the slot straight to the oldest live waiter so it cannot be barged
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def record_degraded(self):
+        self.degraded += 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queue_depth": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "degraded": self.degraded,
+        }
@@ -1,36 +1,306 @@
-import os
+import base64
+import hashlib
+import importlib.util
+import json
+import re
+import threading
 from contextlib import asynccontextmanager
-from datetime import date
+from datetime import UTC, date, datetime
 from typing import Optional
 
-from dotenv import load_dotenv
+from bson import ObjectId
+from bson.errors import InvalidId
 from fastapi import FastAPI
-from passlib.context import CryptContext
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+from src.config import (
+    MONGO_COMPRESSORS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_DB_NAME,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_READ_PREFERENCE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGODB_URI,
+)
+from src.stats_keys import count_stats
 
 from .common_utils import generate_credential_id
 from .logging_utils import setup_logging
 
-load_dotenv()
-
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 logger = setup_logging(__name__)
 
+# Fields returned by certificate listings (no signatures)
+CERTIFICATE_SUMMARY_PROJECTION = {
+    "_id": 1,
+    "credentialId": 1,
+    "name": 1,
+    "course": 1,
+    "categoryCode": 1,
+    "categoryName": 1,
+    "dateIssued": 1,
+    "issuer": 1,
+}
+
+# Public fields returned by /verify. The lookup goes through credentialId_unique and
+# projects these server-side, so signatures are never sent over the wire.
+CERTIFICATE_VERIFY_PROJECTION = {
+    "_id": 0,
+    "credentialId": 1,
+    "name": 1,
+    "course": 1,
+    "categoryCode": 1,
+    "categoryName": 1,
+    "dateIssued": 1,
+    "issuer": 1,
+}
+
+# Indexes backing credential lookups and listings. Listings sort either by newest
+# first (dateIssued, _id descending) or, for name prefix searches, by name; every
+# filter combination has an index ending in its sort keys so keyset pagination
+# never sorts in memory.
+CERTIFICATE_INDEXES = [
+    ([("credentialId", ASCENDING)], {"name": "credentialId_unique", "unique": True}),
+    ([("dateIssued", DESCENDING), ("_id", DESCENDING)], {"name": "date_desc"}),
+    (
+        [("categoryCode", ASCENDING), ("dateIssued", DESCENDING), ("_id", DESCENDING)],
+        {"name": "category_date_desc"},
+    ),
+    (
+        [("course", ASCENDING), ("dateIssued", DESCENDING), ("_id", DESCENDING)],
+        {"name": "course_date_desc"},
+    ),
+    (
+        [
+            ("categoryCode", ASCENDING),
+            ("course", ASCENDING),
+            ("dateIssued", DESCENDING),
+            ("_id", DESCENDING),
+        ],
+        {"name": "category_course_date_desc"},
+    ),
+    ([("name", ASCENDING), ("_id", ASCENDING)], {"name": "name_asc"}),
+    (
+        [("course", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)],
+        {"name": "course_name_asc"},
+    ),
+    (
+        [("categoryCode", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)],
+        {"name": "category_name_asc"},
+    ),
+    (
+        [
+            ("categoryCode", ASCENDING),
+            ("course", ASCENDING),
+            ("name", ASCENDING),
+            ("_id", ASCENDING),
+        ],
+        {"name": "category_course_name_asc"},
+    ),
+]
+
+# Summary collection of issuance counts. Each document is one counter:
+# {"_id": {"dimension": "categoryCode" | "course" | "day" | "total", "value": ...},
+#  "count": n}
+STATS_COLLECTION = "certificate_stats"
+STATS_DIMENSIONS = {"categoryCode": "byCategory", "course": "byCourse", "day": "byDay"}
+
+# Python packages pymongo needs for each wire compressor
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Collect connection pool usage so pools can be sized per worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open_connections = 0
+            self.checked_out = 0
+            self.peak_checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.pool_clears = 0
+
+    def _record_wait(self, duration: float):
+        self.total_wait_seconds += duration
+        self.max_wait_seconds = max(self.max_wait_seconds, duration)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self._record_wait(event.duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_checkout_wait_ms": (
+                    self.total_wait_seconds * 1000 / attempts if attempts else 0.0
+                ),
+                "max_checkout_wait_ms": self.max_wait_seconds * 1000,
+                "pool_clears": self.pool_clears,
+            }
+
+
+pool_stats = PoolStatsListener()
+_client: MongoClient | None = None
+
+
+def _available_compressors() -> list[str]:
+    compressors = []
+    for name in (c.strip() for c in MONGO_COMPRESSORS.split(",")):
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            compressors.append(name)
+    return compressors
+
+
+def get_client() -> MongoClient:
+    """Return the process-wide MongoClient, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = MongoClient(
+            MONGODB_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            compressors=_available_compressors() or None,
+            event_listeners=[pool_stats],
+            # Don't start monitor threads or open sockets until the first operation,
+            # so a pre-fork parent can import the app without holding connections
+            connect=False,
+        )
+    return _client
+
 def setup_db():
-    client = MongoClient(MONGODB_URI)
-    db = client["certify"]
+    client = get_client()
+    # The database handle reads from the primary: seeding checks, logins and
+    # anything that must see its own writes. Read-heavy lookups opt in to
+    # MONGO_READ_PREFERENCE through _read_collection.
+    db = client.get_database(MONGO_DB_NAME)
     return db,client
 
+READ_PREFERENCE = make_read_preference(read_pref_mode_from_name(MONGO_READ_PREFERENCE), None)
+
+def _read_collection(name: str):
+    """A collection routed by MONGO_READ_PREFERENCE, for lookups that tolerate lag."""
+    return db[name].with_options(read_preference=READ_PREFERENCE)
+
 db,client = setup_db()
 
+def set_client(new_client):
+    """Replace the shared client, e.g. with a mongomock stand-in for load tests."""
+    global _client, db, client
+    _client = new_client
+    db, client = setup_db()
+
+def reset_client():
+    """Drop the inherited client and build a fresh one (call after fork)."""
+    pool_stats.reset()
+    set_client(None)
+
+def signature_image_digest(image_b64: str) -> str:
+    """Content digest stored on a signature as imageDigest.
+
+    Certificate ETags hash signature documents without their images, so this is
+    what makes a replaced image produce a new ETag.
+    """
+    return hashlib.sha256(image_b64.encode("ascii")).hexdigest()
+
+def set_signature_image(signature_id: str, image_b64: str) -> bool:
+    """Replace a signature's image and its imageDigest together."""
+    result = db["signatures"].update_one(
+        {"id": signature_id},
+        {"$set": {"image_b64": image_b64, "imageDigest": signature_image_digest(image_b64)}},
+    )
+    return result.matched_count > 0
+
+def sync_signature_digests() -> int:
+    """Recompute imageDigest for signatures missing it or edited in place.
+
+    Runs at startup so images replaced without set_signature_image (or stored
+    before imageDigest existed) still invalidate ETags and cached renders.
+    Returns the number of documents updated.
+    """
+    updates = [
+        UpdateOne({"_id": sig["_id"]}, {"$set": {"imageDigest": digest}})
+        for sig in db["signatures"].find({}, {"image_b64": 1, "imageDigest": 1})
+        if (digest := signature_image_digest(sig.get("image_b64", ""))) != sig.get("imageDigest")
+    ]
+    if updates:
+        db["signatures"].bulk_write(updates, ordered=False)
+        logger.info("Updated the image digest of %d signature(s)", len(updates))
+    return len(updates)
+
 def seed_signatures():
     signatures = db["signatures"]
     if signatures.count_documents({}) == 0:
         with open("test_signature.b64", "r") as f:
             base64_signature_1 = f.read().strip()
+        digest = signature_image_digest(base64_signature_1)
         signatures.insert_many([
-            {"id": "pmvodpn5", "name": "Amal", "post": "President", "image_b64": base64_signature_1},
-            {"id": "szoii2l2", "name": "Kamal", "post": "Secretary", "image_b64": base64_signature_1}
+            {"id": "pmvodpn5", "name": "Amal", "post": "President", "image_b64": base64_signature_1, "imageDigest": digest},
+            {"id": "szoii2l2", "name": "Kamal", "post": "Secretary", "image_b64": base64_signature_1, "imageDigest": digest}
         ])
         logger.info("Inserted sample signatures: %s, %s", "pmvodpn5", "szoii2l2")
     else:
@@ -40,7 +310,7 @@ def seed_certificates():
     certificates = db["certificates"]
     if certificates.count_documents({}) == 0:
         cred_id = generate_credential_id()
-        certificates.insert_one({
+        certificate = {
             "credentialId": cred_id,
             "name": "Saman Sliva",
             "course": "Club Member",
@@ -49,7 +319,9 @@ def seed_certificates():
             "dateIssued": date.today().isoformat(),
             "issuer": "Mozilla Campus Club SLIIT",
             "signatures": ["pmvodpn5", "szoii2l2"]
-        })
+        }
+        certificates.insert_one(certificate)
+        record_certificates_issued([certificate])
         logger.info("Inserted sample certificate with credentialId: %s", cred_id)
     else:
         logger.info("Certificates collection already has data, skipping seed.")
@@ -57,18 +329,20 @@ def seed_certificates():
 def seed_users():
     users = db["users"]
     if users.count_documents({}) == 0:
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        # Imported lazily: auth_utils looks users up through this module
+        from .auth_utils import hash_password
+
         fake_users = [
             {
                 "name": "Admin User",
                 "email": "admin@example.com",
-                "password": pwd_context.hash("1234"),
+                "password": hash_password("1234"),
                 "role": "admin"
             },
             {
                 "name": "Regular User",
                 "email": "user@example.com",
-                "password": pwd_context.hash("1234"),
+                "password": hash_password("1234"),
                 "role": "user"
             }
         ]
@@ -77,6 +351,34 @@ def seed_users():
     else:
         logger.info("Users collection already has data, skipping seed.")
 
+def ensure_indexes():
+    certificates = db["certificates"]
+    for keys, options in CERTIFICATE_INDEXES:
+        try:
+            certificates.create_index(keys, **options)
+        except OperationFailure as e:
+            logger.error("Could not create index %s: %s", options["name"], e)
+
+_database_prepared = False
+
+def prepare_database():
+    """Seed the sample data, create indexes and stats, once per process tree.
+
+    The seeders check for an empty collection before inserting, so concurrent
+    workers could each seed a copy. src.server runs this in the parent before
+    forking; the workers inherit the flag and their lifespan skips it.
+    """
+    global _database_prepared
+    if _database_prepared:
+        return
+    seed_signatures()
+    sync_signature_digests()
+    seed_certificates()
+    seed_users()
+    ensure_indexes()
+    ensure_certificate_stats()
+    _database_prepared = True
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     try:
@@ -85,20 +387,45 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error("MongoDB connection failed: %s", e)
 
-    seed_signatures()
-    seed_certificates()
-    seed_users()
+    prepare_database()
 
+    # Imported lazily: the prewarmer renders certificates, which depends on this module
+    from .certificate_utils import start_prewarming, stop_prewarming
+    from .disk_cache_utils import start_disk_cache_eviction, stop_disk_cache_eviction
+
+    start_prewarming()
+    start_disk_cache_eviction()
     yield
+    await stop_disk_cache_eviction()
+    await stop_prewarming()
 
 def get_certificate_by_credential(credential_id: str) -> Optional[dict]:
-    cert = db["certificates"].find_one({"credentialId": credential_id})
+    query = {"credentialId": credential_id}
+    cert = _read_collection("certificates").find_one(query)
+    if cert is None:
+        # Just issued and not replicated yet? The primary has the final word.
+        cert = db["certificates"].find_one(query)
     if cert:
         cert["_id"] = str(cert["_id"])
     return cert
 
-def get_signatures_by_ids(signature_ids: list) -> list[dict]:
-    signature_docs = list(db["signatures"].find({"id": {"$in": signature_ids}}))
+def get_certificate_for_verification(credential_id: str) -> dict | None:
+    """The public fields of a certificate, without signatures or _id."""
+    query = {"credentialId": credential_id}
+    cert = _read_collection("certificates").find_one(query, CERTIFICATE_VERIFY_PROJECTION)
+    if cert is None:
+        cert = db["certificates"].find_one(query, CERTIFICATE_VERIFY_PROJECTION)
+    return cert
+
+def get_signatures_by_ids(signature_ids: list, include_images: bool = True) -> list[dict]:
+    """Signature documents for the given IDs.
+
+    With include_images=False the (large) image_b64 blobs are left out, which is
+    all that is needed to identify the signatures, e.g. for ETags: imageDigest
+    still stands in for the image.
+    """
+    projection = None if include_images else {"image_b64": 0}
+    signature_docs = list(_read_collection("signatures").find({"id": {"$in": signature_ids}}, projection))
     for sig in signature_docs:
         sig["_id"] = str(sig.get("_id", ""))
 
@@ -114,10 +441,185 @@ def get_signatures_by_ids(signature_ids: list) -> list[dict]:
 
     return signature_docs
 
+def get_recent_credential_ids(limit: int) -> list[str]:
+    """Credential IDs of the most recently inserted certificates (newest first)."""
+    cursor = (
+        _read_collection("certificates")
+        .find({}, {"_id": 0, "credentialId": 1})
+        .sort("_id", -1)
+        .limit(limit)
+    )
+    return [doc["credentialId"] for doc in cursor]
+
+def encode_cursor(sort_value: str | None, object_id) -> str:
+    raw = json.dumps([sort_value, str(object_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[str | None, ObjectId]:
+    """Decode a listing cursor, raising ValueError if it was tampered with.
+
+    The sort value is None when the last document of the page had no such field.
+    """
+    try:
+        sort_value, object_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if sort_value is not None:
+            sort_value = str(sort_value)
+        return sort_value, ObjectId(object_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise ValueError("Invalid cursor") from e
+
+def search_certificates(
+    category_code: str | None = None,
+    course: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    name_prefix: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+) -> dict:
+    """List certificates with keyset pagination.
+
+    Results are ordered newest first, or alphabetically when searching by name
+    prefix. Each page continues from the last key of the previous page (the opaque
+    cursor) instead of skipping, so deep pages cost the same as the first one.
+    """
+    filters: list[dict] = []
+    if category_code:
+        filters.append({"categoryCode": category_code})
+    if course:
+        filters.append({"course": course})
+    date_range = {}
+    if date_from:
+        date_range["$gte"] = date_from.isoformat()
+    if date_to:
+        date_range["$lte"] = date_to.isoformat()
+    if date_range:
+        filters.append({"dateIssued": date_range})
+
+    if name_prefix:
+        # An anchored, case-sensitive prefix regex is answered from the name index
+        filters.append({"name": {"$regex": f"^{re.escape(name_prefix)}"}})
+        sort_field, direction, after = "name", ASCENDING, "$gt"
+    else:
+        sort_field, direction, after = "dateIssued", DESCENDING, "$lt"
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        filters.append({"$or": [
+            {sort_field: {after: last_value}},
+            {sort_field: last_value, "_id": {after: last_id}},
+        ]})
+
+    query = {"$and": filters} if filters else {}
+    docs = list(
+        _read_collection("certificates")
+        .find(query, CERTIFICATE_SUMMARY_PROJECTION)
+        .sort([(sort_field, direction), ("_id", direction)])
+        .limit(limit + 1)
+    )
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        # Documents without the sort field sort as null, so carry None forward;
+        # the next page then continues among the other null ones by _id
+        next_cursor = encode_cursor(docs[-1].get(sort_field), docs[-1]["_id"])
+    for doc in docs:
+        doc.pop("_id", None)
+    return {"items": docs, "nextCursor": next_cursor}
+
+def record_certificates_issued(certificates: list[dict]):
+    """Increment the issuance counters for newly inserted certificates."""
+    counts = count_stats(certificates)
+    if not counts:
+        return
+    db[STATS_COLLECTION].bulk_write(
+        [
+            UpdateOne(
+                {"_id": {"dimension": dimension, "value": value}},
+                {"$inc": {"count": count}},
+                upsert=True,
+            )
+            for (dimension, value), count in counts.items()
+        ],
+        ordered=False,
+    )
+
+def rebuild_certificate_stats() -> int:
+    """Recompute every counter from the certificates collection with $merge.
+
+    Counters are replaced in place and ones that no longer match any certificate
+    are removed afterwards. Increments that land while the rebuild runs may be
+    overwritten, so run it outside imports. Returns the number of counters.
+    """
+    rebuilt_at = datetime.now(UTC)
+    # Only counters that predate the rebuild are candidates for removal; ones
+    # an import upserts meanwhile have no rebuiltAt but are still current
+    previous = [doc["_id"] for doc in db[STATS_COLLECTION].find({}, {"_id": 1})]
+    db["certificates"].aggregate([
+        {"$project": {"_id": 0, "keys": [
+            {"dimension": "total", "value": "all"},
+            # $ifNull keeps the value key for missing fields ({value: null}), so
+            # the _id matches the counter record_certificates_issued increments
+            {"dimension": "categoryCode", "value": {"$ifNull": ["$categoryCode", None]}},
+            {"dimension": "course", "value": {"$ifNull": ["$course", None]}},
+            {"dimension": "day", "value": {"$ifNull": ["$dateIssued", None]}},
+        ]}},
+        {"$unwind": "$keys"},
+        {"$group": {"_id": "$keys", "count": {"$sum": 1}}},
+        {"$set": {"rebuiltAt": rebuilt_at}},
+        {"$merge": {
+            "into": STATS_COLLECTION,
+            "on": "_id",
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ])
+    if previous:
+        db[STATS_COLLECTION].delete_many(
+            {"_id": {"$in": previous}, "rebuiltAt": {"$ne": rebuilt_at}}
+        )
+    count = db[STATS_COLLECTION].count_documents({})
+    logger.info("Rebuilt %d certificate stats counters", count)
+    return count
+
+def ensure_certificate_stats():
+    """Build the stats counters if there are certificates but no counters yet.
+
+    Covers databases that predate the counters or whose summary was dropped.
+    A failed rebuild ($merge needs MongoDB 4.2+ and write access to the stats
+    collection) is logged rather than raised, so the API still starts; /api/stats
+    then reports empty counters until a rebuild succeeds.
+    """
+    if db[STATS_COLLECTION].count_documents({}, limit=1):
+        return
+    if not db["certificates"].count_documents({}, limit=1):
+        return
+    try:
+        rebuild_certificate_stats()
+    # NotImplementedError: in-memory stand-ins such as mongomock lack $merge
+    except (PyMongoError, NotImplementedError) as e:
+        logger.error("Could not rebuild certificate stats: %s", e)
+
+def get_certificate_stats() -> dict:
+    stats: dict = {"total": 0, **{name: {} for name in STATS_DIMENSIONS.values()}}
+    for doc in _read_collection(STATS_COLLECTION).find({}, {"count": 1}):
+        dimension, value = doc["_id"]["dimension"], doc["_id"]["value"]
+        if dimension == "total":
+            stats["total"] = doc["count"]
+        elif dimension in STATS_DIMENSIONS:
+            stats[STATS_DIMENSIONS[dimension]][str(value)] = doc["count"]
+    stats["byDay"] = dict(sorted(stats["byDay"].items()))
+    return stats
+
 def get_user_by_email(email: str):
+    # Authentication must see the latest user record, so this reads the primary
     user = db["users"].find_one({"email": email})
     if user:
         logger.info("Found user with email: %s", email)
     else:
         logger.warning("No user found with email: %s", email)
-    return user
\ No newline at end of file
+    return user
+
+def get_pool_stats() -> dict:
+    return pool_stats.snapshot()
\ No newline at end of file
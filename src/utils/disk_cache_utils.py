@@ -0,0 +1,253 @@
+import asyncio
+import os
+import stat
+import tempfile
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from src.config import (
+    DISK_CACHE_DIR,
+    DISK_CACHE_EVICT_INTERVAL_SECONDS,
+    DISK_CACHE_MAX_BYTES,
+)
+from src.utils.logging_utils import setup_logging
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = setup_logging(__name__)
+
+# A hit refreshes the file's mtime (the LRU clock) at most this often, so hot
+# artifacts do not cost a metadata write on every request.
+TOUCH_INTERVAL_SECONDS = 60
+# Eviction trims down to this share of max_bytes, so it does not run on every sweep
+EVICT_LOW_WATERMARK = 0.9
+# Temporary files left behind by a worker that died mid-write
+STALE_TEMP_SECONDS = 600
+TEMP_PREFIX = ".tmp-"
+
+
+class DiskRenderCache:
+    """Content-addressed cache of rendered certificate images on local disk.
+
+    Artifacts are named by a key derived from the certificate digest and renderer
+    versions (see artifact_key), so they never go stale and every worker on the
+    host, and the next deployment, can reuse them. Writes go to a temporary file
+    that is renamed into place, so readers only ever see complete artifacts. Hits
+    bump the file's mtime and evict() removes the least recently used files once
+    the directory exceeds max_bytes.
+
+    Cached files are served as they are, so the directory is created private
+    (0700) on first use. A directory that is owned by another user, or that
+    others can write to, is refused and the cache stays disabled.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DISK_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        # Measured by each eviction sweep and grown by this process's writes since;
+        # other workers' writes only show up at the next sweep
+        self.size_bytes = 0
+        self._usable: bool | None = None
+
+    @property
+    def enabled(self) -> bool:
+        if not self.directory:
+            return False
+        if self._usable is None:
+            self._usable = self._prepare_directory()
+        return self._usable
+
+    def _prepare_directory(self) -> bool:
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            info = os.lstat(self.directory)
+        except OSError as e:
+            logger.error("Disk render cache disabled, cannot use %s: %s", self.directory, e)
+            return False
+        if not stat.S_ISDIR(info.st_mode):
+            problem = "is not a directory"
+        elif hasattr(os, "getuid") and info.st_uid != os.getuid():
+            problem = "is owned by another user"
+        elif info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            problem = "is writable by other users"
+        else:
+            return True
+        logger.error("Disk render cache disabled, %s %s", self.directory, problem)
+        return False
+
+    def path(self, key: str, ext: str) -> str:
+        # Fan out over subdirectories so no single directory grows too large
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def lookup(self, key: str, ext: str) -> str | None:
+        """Path of a cached artifact, or None if it is not on disk."""
+        if not self.enabled:
+            return None
+        path = self.path(key, ext)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self.misses += 1
+            return None
+        if time.time() - mtime > TOUCH_INTERVAL_SECONDS:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        self.hits += 1
+        return path
+
+    def read(self, key: str, ext: str) -> bytes | None:
+        """The contents of a cached artifact, or None if it is not on disk.
+
+        A plain copy rather than a memory map: the result may be kept in the
+        in-memory render cache, where a mapping would hold a file descriptor open
+        and pin the file's pages after eviction. This blocks, so call it from a
+        worker thread; bare images are served from lookup()'s path instead.
+        """
+        path = self.lookup(key, ext)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read() or None
+        except OSError:
+            # Evicted between lookup and open
+            return None
+
+    def write(self, key: str, ext: str, data: bytes):
+        """Atomically store an artifact; failures are logged and otherwise ignored."""
+        if not self.enabled:
+            return
+        path = self.path(key, ext)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=directory)
+        except OSError as e:
+            logger.warning("Could not write render artifact %s: %s", path, e)
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.writes += 1
+            self.size_bytes += len(data)
+        except OSError as e:
+            logger.warning("Could not write render artifact %s: %s", path, e)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def evict(self) -> int:
+        """Delete least recently used artifacts until under the size cap.
+
+        Only one worker sweeps at a time (an advisory lock on the directory); the
+        others skip the round. Returns the number of files removed.
+        """
+        if not self.enabled or not os.path.isdir(self.directory):
+            return 0
+        with open(os.path.join(self.directory, ".evict.lock"), "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0
+            return self._sweep()
+
+    def _sweep(self) -> int:
+        now = time.time()
+        removed = 0
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            for item in os.scandir(entry.path):
+                try:
+                    info = item.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if item.name.startswith(TEMP_PREFIX):
+                    if now - info.st_mtime > STALE_TEMP_SECONDS:
+                        self._remove(item.path)
+                    continue
+                files.append((info.st_mtime, info.st_size, item.path))
+
+        total = sum(size for _, size, _ in files)
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_LOW_WATERMARK
+            files.sort()
+            for _, size, path in files:
+                if total <= target:
+                    break
+                if self._remove(path):
+                    total -= size
+                    removed += 1
+        self.size_bytes = total
+        self.evictions += removed
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory,
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+
+disk_cache = DiskRenderCache(DISK_CACHE_DIR)
+
+
+async def _evict_loop():
+    while True:
+        try:
+            removed = await run_in_threadpool(disk_cache.evict)
+            if removed:
+                logger.info("Evicted %d render artifact(s) from disk", removed)
+        except OSError as e:
+            logger.error("Render artifact eviction failed: %s", e)
+        await asyncio.sleep(DISK_CACHE_EVICT_INTERVAL_SECONDS)
+
+
+_evict_task: asyncio.Task | None = None
+
+
+def start_disk_cache_eviction():
+    global _evict_task
+    if disk_cache.enabled and _evict_task is None:
+        _evict_task = asyncio.create_task(_evict_loop())
+
+
+async def stop_disk_cache_eviction():
+    global _evict_task
+    if _evict_task is not None:
+        _evict_task.cancel()
+        try:
+            await _evict_task
+        except asyncio.CancelledError:
+            pass
+        _evict_task = None
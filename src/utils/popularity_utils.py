@@ -0,0 +1,99 @@
+import time
+
+from src.config import POPULARITY_DECAY_INTERVAL_SECONDS, POPULARITY_TOP_K
+
+# After this many halvings every counter is zero, so longer idle gaps cost the same
+MAX_DECAY_STEPS = 32
+
+
+class CountMinSketch:
+    """Fixed-size approximate counter; estimates never undercount a key."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._rows = [[0] * width for _ in range(depth)]
+
+    def _slots(self, key: str):
+        for row in range(self.depth):
+            yield row, hash((row, key)) % self.width
+
+    def add(self, key: str, count: int = 1) -> int:
+        estimate = None
+        for row, slot in self._slots(key):
+            self._rows[row][slot] += count
+            value = self._rows[row][slot]
+            estimate = value if estimate is None else min(estimate, value)
+        return estimate or 0
+
+    def estimate(self, key: str) -> int:
+        return min(self._rows[row][slot] for row, slot in self._slots(key))
+
+    def decay(self, steps: int = 1):
+        for row in self._rows:
+            for slot, value in enumerate(row):
+                row[slot] = value >> steps
+
+
+class PopularityTracker:
+    """Decaying top-K of the most requested keys backed by a count-min sketch.
+
+    Memory is bounded by the sketch size plus K candidates, regardless of how many
+    distinct keys are seen. Counts are halved once per decay_interval seconds,
+    applied lazily on the next record() or hottest(), so old traffic fades out
+    whether or not anything else is running.
+    """
+
+    def __init__(
+        self,
+        top_k: int = POPULARITY_TOP_K,
+        width: int = 2048,
+        decay_interval: float = POPULARITY_DECAY_INTERVAL_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.top_k = top_k
+        self.decay_interval = decay_interval
+        self._clock = clock
+        self._last_decay = clock()
+        self._sketch = CountMinSketch(width=width)
+        self._top: dict[str, int] = {}
+
+    def _decay_elapsed(self):
+        if self.decay_interval <= 0:
+            return
+        steps = int((self._clock() - self._last_decay) // self.decay_interval)
+        if steps:
+            self._last_decay += steps * self.decay_interval
+            self.decay(min(steps, MAX_DECAY_STEPS))
+
+    def record(self, key: str):
+        self._decay_elapsed()
+        estimate = self._sketch.add(key)
+        if key in self._top or len(self._top) < self.top_k:
+            self._top[key] = estimate
+            return
+        coldest = min(self._top, key=self._top.__getitem__)
+        if estimate > self._top[coldest]:
+            del self._top[coldest]
+            self._top[key] = estimate
+
+    def decay(self, steps: int = 1):
+        self._sketch.decay(steps)
+        self._top = {
+            key: count >> steps for key, count in self._top.items() if count >> steps
+        }
+
+    def hottest(self, limit: int | None = None) -> list[tuple[str, int]]:
+        self._decay_elapsed()
+        ranked = sorted(self._top.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit] if limit is not None else ranked
+
+
+credential_popularity = PopularityTracker()
+category_popularity = PopularityTracker(width=256)
+
+
+def record_certificate_view(credential_id: str, category_code: str | None):
+    credential_popularity.record(credential_id)
+    if category_code:
+        category_popularity.record(category_code)
@@ -0,0 +1,270 @@
+import asyncio
+import glob
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Optional
+
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+from src.config import (
+    PROFILING_INTERVAL_MS,
+    PROFILING_MAX_FILES,
+    PROFILING_OUTPUT_DIR,
+    PROFILING_SAMPLE_RATE,
+)
+from src.utils.auth_utils import decode_access_token
+from src.utils.logging_utils import setup_logging
+
+logger = setup_logging(__name__)
+
+PROFILE_HEADER = b"x-certify-profile"
+PROFILE_MODES = {b"return": "return", b"store": "store"}
+PROFILED_PATHS = re.compile(r"^/api/(certificate/[^/]+(/image|/verify)?|login)$")
+# Stacks whose innermost Python frame is in one of these files are threads parked
+# waiting for work (event loop select, idle pool workers, driver monitors)
+IDLE_FILES = {
+    "threading.py",
+    "selectors.py",
+    "queue.py",
+    "thread.py",
+    "periodic_executor.py",
+}
+# The profiler of the request the current context belongs to; see run_in_threadpool
+_profiled_request: ContextVar[Optional["SamplingProfiler"]] = ContextVar(
+    "profiled_request", default=None
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+async def run_in_threadpool(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """starlette's run_in_threadpool, tagging the job for a profiled request.
+
+    When the submitting request is being profiled, the worker thread is registered
+    with its profiler for the duration of the job, so the profiler samples that
+    thread and no others. Use this for threadpool work done on behalf of requests.
+    """
+    profiler = _profiled_request.get()
+    if profiler is None:
+        return await _run_in_threadpool(func, *args, **kwargs)
+    return await _run_in_threadpool(profiler._run_job, func, args, kwargs)
+
+
+class SamplingProfiler:
+    """Wall-clock sampler of busy threads, producing folded stacks.
+
+    Started with a task, only the work of that request is sampled: the event loop
+    thread while the task itself is running, and threadpool threads running jobs
+    the request submitted through run_in_threadpool (renders, Mongo queries), so
+    concurrent requests do not show up in the profile. Without a task every busy thread is
+    sampled. Parked threads are skipped either way. The output is the "folded"
+    format consumed by flamegraph.pl and speedscope: one ``frame;frame;frame count``
+    line per distinct stack.
+    """
+
+    def __init__(self, interval: float = PROFILING_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_ident: int | None = None
+        self._context_token = None
+        # Threads currently running a job for the profiled request
+        self._job_threads: set[int] = set()
+        self.started = 0.0
+        self.duration = 0.0
+
+    def _belongs_to_task(self, ident: int, frame) -> bool:
+        if ident == self._loop_ident:
+            return asyncio.current_task(self._loop) is self._task
+        return ident in self._job_threads
+
+    def _run_job(self, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        ident = threading.get_ident()
+        self._job_threads.add(ident)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._job_threads.discard(ident)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                if self._task is not None and not self._belongs_to_task(ident, frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self, task: asyncio.Task | None = None):
+        """Start sampling; with task, called from that task, sample only its request."""
+        if task is not None:
+            self._task = task
+            self._loop = task.get_loop()
+            self._loop_ident = threading.get_ident()
+            self._context_token = _profiled_request.set(self)
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        if self._context_token is not None:
+            _profiled_request.reset(self._context_token)
+            self._context_token = None
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _is_admin(headers: dict[bytes, bytes]) -> bool:
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    payload = decode_access_token(token)
+    return bool(payload) and payload.get("role") == "admin"
+
+
+def save_profile(
+    profiler: SamplingProfiler,
+    path: str,
+    directory: str = PROFILING_OUTPUT_DIR,
+    max_files: int = PROFILING_MAX_FILES,
+) -> str:
+    """Write a profile to directory, keeping only the max_files newest there."""
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    filename = os.path.join(directory, f"{stamp}-{slug}-{os.getpid()}.folded")
+    with open(filename, "w") as f:
+        f.write(profiler.folded())
+    if max_files > 0:
+        # Names start with the timestamp, so they sort oldest first
+        for old in sorted(glob.glob(os.path.join(directory, "*.folded")))[:-max_files]:
+            try:
+                os.unlink(old)
+            except OSError:
+                pass
+    return filename
+
+
+async def _reject_profile_mode(send):
+    body = b"X-Certify-Profile must be 'return' or 'store'"
+    await send({
+        "type": "http.response.start",
+        "status": 400,
+        "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling single certificate/login requests on demand.
+
+    An admin (bearer token with role "admin") sends ``X-Certify-Profile: return`` to
+    get the folded-stack profile back instead of the normal response, or
+    ``X-Certify-Profile: store`` to have it written to PROFILING_OUTPUT_DIR; any
+    other value from an admin is rejected with 400. The header is ignored on
+    requests from anyone else. With PROFILING_SAMPLE_RATE=N, one in N
+    matching requests is also stored. Only one request is profiled at a time;
+    everything else passes straight through.
+    """
+
+    def __init__(self, app, sample_rate: int = PROFILING_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILED_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        mode = None
+        headers = dict(scope["headers"])
+        requested = headers.get(PROFILE_HEADER)
+        if requested is not None:
+            # Check the token first, so only admins learn the header means anything
+            if not _is_admin(headers):
+                logger.warning("Ignoring profile request without admin token")
+            else:
+                mode = PROFILE_MODES.get(requested.strip().lower())
+                if mode is None:
+                    await _reject_profile_mode(send)
+                    return
+        elif self.sample_rate and random.randrange(self.sample_rate) == 0:
+            mode = "store"
+
+        if mode is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, mode)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope, receive, send, mode: str):
+        profiler = SamplingProfiler()
+        status = None
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            if mode == "store":
+                await send(message)
+
+        profiler.start(asyncio.current_task())
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.stop()
+
+        if mode == "store":
+            filename = save_profile(profiler, scope["path"])
+            logger.info(
+                "Stored profile of %s (%.1f ms) in %s",
+                scope["path"],
+                profiler.duration * 1000,
+                filename,
+            )
+            return
+
+        body = profiler.folded().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"cache-control", b"no-store"),
+                (b"x-profiled-status", str(status).encode()),
+                (b"x-profile-duration-ms", f"{profiler.duration * 1000:.1f}".encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
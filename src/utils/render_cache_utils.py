@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+from src.config import RENDER_CACHE_MAX_BYTES
+
+# Serialized response bodies; dicts are payloads that have not been encoded yet
+Payload = bytes
+
+
+def estimate_payload_size(payload: Payload) -> int:
+    """Approximate memory held by a rendered payload (an encoded response body)."""
+    return len(payload)
+
+
+class RenderCache:
+    """LRU cache of rendered certificate payloads keyed by ETag.
+
+    Payloads are serialized response bodies, so a hit is served without
+    re-encoding anything.
+
+    Keys are content hashes, so an entry can never be stale: an edited certificate,
+    signature or style gets a new ETag. The cache also remembers which ETag was last
+    rendered for each credential ID to report coverage of the hot set.
+    """
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[str, Payload, int]] = OrderedDict()
+        self._by_credential: dict[str, str] = {}
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, etag: str) -> Payload | None:
+        entry = self._entries.get(etag)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(etag)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, credential_id: str, etag: str, payload: Payload):
+        size = estimate_payload_size(payload)
+        if size > self.max_bytes:
+            return
+        if etag in self._entries:
+            self.size_bytes -= self._entries.pop(etag)[2]
+        self._entries[etag] = (credential_id, payload, size)
+        self._by_credential[credential_id] = etag
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            _, (old_credential, _, old_size) = self._entries.popitem(last=False)
+            self.size_bytes -= old_size
+            self.evictions += 1
+            if self._by_credential.get(old_credential) not in self._entries:
+                self._by_credential.pop(old_credential, None)
+
+    def __contains__(self, etag: str) -> bool:
+        return etag in self._entries
+
+    def latest_for(self, credential_id: str) -> Payload | None:
+        """Most recent render for a credential, possibly of an older version.
+
+        Only meant for degraded mode, when rendering the current version is refused.
+        """
+        entry = self._entries.get(self._by_credential.get(credential_id, ""))
+        return entry[1] if entry else None
+
+    def contains_credential(self, credential_id: str) -> bool:
+        return self._by_credential.get(credential_id) in self._entries
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+render_cache = RenderCache()
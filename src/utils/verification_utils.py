@@ -0,0 +1,145 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PrivateKey,
+    Ed25519PublicKey,
+)
+
+from src.config import VERIFY_SIGNING_KEY
+
+SIGNATURE_ALGORITHM = "Ed25519"
+# Fields covered by the digest, in the shape returned by /verify
+VERIFIED_FIELDS = (
+    "credentialId",
+    "issuer",
+    "recipient",
+    "course",
+    "categoryCode",
+    "categoryName",
+    "dateIssued",
+)
+
+
+def load_signing_key(encoded: str) -> Ed25519PrivateKey:
+    """Parse VERIFY_SIGNING_KEY: a PEM private key or a base64 32-byte seed."""
+    encoded = encoded.strip()
+    if encoded.startswith("-----BEGIN"):
+        key = serialization.load_pem_private_key(encoded.encode("ascii"), password=None)
+        if not isinstance(key, Ed25519PrivateKey):
+            raise ValueError("VERIFY_SIGNING_KEY must be an Ed25519 key")
+        return key
+    try:
+        seed = base64.b64decode(encoded, validate=True)
+    except binascii.Error as e:
+        raise ValueError("VERIFY_SIGNING_KEY is not valid base64") from e
+    if len(seed) != 32:
+        raise ValueError("VERIFY_SIGNING_KEY must decode to 32 bytes")
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+# Loaded at import so a malformed key stops the app from starting
+_signing_key: Ed25519PrivateKey | None = (
+    load_signing_key(VERIFY_SIGNING_KEY) if VERIFY_SIGNING_KEY else None
+)
+
+
+def signing_configured() -> bool:
+    return _signing_key is not None
+
+
+def _raw_public_key(public_key: Ed25519PublicKey) -> bytes:
+    return public_key.public_bytes(
+        serialization.Encoding.Raw, serialization.PublicFormat.Raw
+    )
+
+
+def key_id(public_key: Ed25519PublicKey) -> str:
+    """Short fingerprint of a public key, so verifiers can tell rotated keys apart."""
+    return hashlib.sha256(_raw_public_key(public_key)).hexdigest()[:16]
+
+
+def get_public_key_info() -> dict:
+    """The published verification key, as served by /api/verify/public-key."""
+    if _signing_key is None:
+        raise RuntimeError("VERIFY_SIGNING_KEY is not configured")
+    public_key = _signing_key.public_key()
+    return {
+        "algorithm": SIGNATURE_ALGORITHM,
+        "keyId": key_id(public_key),
+        "publicKey": base64.b64encode(_raw_public_key(public_key)).decode("ascii"),
+        "publicKeyPem": public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode("ascii"),
+    }
+
+
+def _digest(record: dict) -> str:
+    canonical = json.dumps(
+        {key: record.get(key) for key in VERIFIED_FIELDS},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return "sha256:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def build_verification(
+    cert_doc: dict, signing_key: Ed25519PrivateKey | None = None
+) -> dict:
+    """Build the /verify response from a certificate's public fields.
+
+    digest is a SHA-256 over the canonical JSON of the returned fields and signature
+    an Ed25519 signature of that digest (hex), so anyone holding the published public
+    key can check a copy offline without being able to forge one. keyId names the
+    key that signed it. signing_key defaults to VERIFY_SIGNING_KEY.
+    """
+    signing_key = signing_key or _signing_key
+    if signing_key is None:
+        raise RuntimeError("VERIFY_SIGNING_KEY is not configured")
+    # A missing date stays null rather than becoming the string "None"
+    date_issued = cert_doc.get("dateIssued")
+    record = {
+        "credentialId": cert_doc["credentialId"],
+        "issuer": cert_doc.get("issuer"),
+        "recipient": cert_doc.get("name"),
+        "course": cert_doc.get("course"),
+        "categoryCode": cert_doc.get("categoryCode"),
+        "categoryName": cert_doc.get("categoryName"),
+        "dateIssued": None if date_issued is None else str(date_issued),
+    }
+    digest = _digest(record)
+    return {
+        "valid": True,
+        **record,
+        "digest": digest,
+        "signature": signing_key.sign(digest.encode("ascii")).hex(),
+        "signatureAlgorithm": SIGNATURE_ALGORITHM,
+        "keyId": key_id(signing_key.public_key()),
+    }
+
+
+def check_verification(
+    payload: dict, public_key: Ed25519PublicKey | None = None
+) -> bool:
+    """Whether a /verify response is untampered: its digest and signature match.
+
+    public_key defaults to the public half of VERIFY_SIGNING_KEY.
+    """
+    if public_key is None:
+        if _signing_key is None:
+            raise RuntimeError("VERIFY_SIGNING_KEY is not configured")
+        public_key = _signing_key.public_key()
+    digest = _digest(payload)
+    if not hmac.compare_digest(payload.get("digest", ""), digest):
+        return False
+    try:
+        public_key.verify(bytes.fromhex(payload.get("signature", "")), digest.encode("ascii"))
+    except (InvalidSignature, ValueError):
+        return False
+    return True
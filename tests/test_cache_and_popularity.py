@@ -0,0 +1,46 @@
+from src.utils.popularity_utils import CountMinSketch, PopularityTracker
+from src.utils.render_cache_utils import RenderCache
+
+
+def _payload(size):
+    return b"A" * size
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(max_bytes=250)
+    cache.put("c1", "e1", _payload(100))
+    cache.put("c2", "e2", _payload(100))
+    assert cache.get("e1") is not None
+    cache.put("c3", "e3", _payload(100))
+
+    assert cache.get("e2") is None
+    assert cache.contains_credential("c1")
+    assert not cache.contains_credential("c2")
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size_bytes"] == 200
+
+def test_count_min_sketch_never_undercounts():
+    sketch = CountMinSketch(width=16, depth=3)
+    for i in range(50):
+        sketch.add(f"key{i % 5}")
+    assert all(sketch.estimate(f"key{i}") >= 10 for i in range(5))
+
+def test_popularity_tracker_keeps_hottest_and_decays():
+    tracker = PopularityTracker(top_k=2)
+    for key, views in (("a", 5), ("b", 3), ("c", 8)):
+        for _ in range(views):
+            tracker.record(key)
+
+    assert [key for key, _ in tracker.hottest()] == ["c", "a"]
+    tracker.decay()
+    assert tracker.hottest() == [("c", 4), ("a", 2)]
+
+def test_popularity_tracker_decays_lazily_with_elapsed_time():
+    now = [0.0]
+    tracker = PopularityTracker(top_k=2, decay_interval=10, clock=lambda: now[0])
+    for _ in range(8):
+        tracker.record("a")
+
+    now[0] = 25  # two intervals later, with no background task involved
+    assert tracker.hottest() == [("a", 2)]
+    now[0] = 1000
+    assert tracker.hottest() == []
@@ -0,0 +1,63 @@
+from src.utils.cache_utils import (
+    artifact_key,
+    certificate_cache_headers,
+    compute_certificate_etag,
+    etag_matches,
+    format_etag,
+)
+
+
+def _cert_doc(**overrides):
+    doc = {
+        "_id": "123",
+        "credentialId": "abc123",
+        "name": "Saman Silva",
+        "categoryCode": "LC",
+        "signatures": [{"id": "sig1", "image_b64": "AAAA"}],
+    }
+    doc.update(overrides)
+    return doc
+
+def test_compute_certificate_etag_is_stable():
+    assert compute_certificate_etag(_cert_doc()) == compute_certificate_etag(_cert_doc())
+
+def test_compute_certificate_etag_changes_with_content():
+    etag = compute_certificate_etag(_cert_doc())
+    assert etag.startswith('"') and etag.endswith('"')
+    assert compute_certificate_etag(_cert_doc(name="Nimal Perera")) != etag
+
+def test_compute_certificate_etag_changes_with_signature_image_digest():
+    # ETags are computed from image-less signature documents (see load_certificate)
+    def without_image(digest):
+        return _cert_doc(signatures=[{"id": "sig1", "imageDigest": digest}])
+
+    assert compute_certificate_etag(without_image("aa")) != compute_certificate_etag(
+        without_image("bb")
+    )
+
+def test_etag_matches():
+    etag = compute_certificate_etag(_cert_doc())
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+def test_certificate_cache_headers():
+    headers = certificate_cache_headers('"abc"')
+    assert headers["ETag"] == '"abc"'
+    assert "stale-while-revalidate=" in headers["Cache-Control"]
+
+def test_format_etag_is_distinct_per_format():
+    etag = compute_certificate_etag(_cert_doc())
+    assert format_etag(etag, "png") == etag
+    svg_etag = format_etag(etag, "svg")
+    assert svg_etag != etag
+    assert svg_etag.startswith(etag[:-1]) and svg_etag.endswith('"')
+
+def test_artifact_key_is_shared_by_json_and_image_renders():
+    etag = compute_certificate_etag(_cert_doc())
+    assert artifact_key(etag, "png") == etag.strip('"')
+    assert artifact_key(etag, "svg") != artifact_key(etag, "png")
+    assert '"' not in artifact_key(etag, "svg")
+
@@ -0,0 +1,9 @@
+from src.utils.certificate_img_utils import signature_key
+
+
+def test_signature_key_is_a_content_digest():
+    blob = "A" * 200_000
+    # Equal content from different string objects shares a key
+    assert signature_key(blob) == signature_key("".join(["A" * 100_000, "A" * 100_000]))
+    # Same length, different content (even past the first chunk) does not
+    assert signature_key(blob) != signature_key("A" * 199_999 + "B")
@@ -0,0 +1,73 @@
+import base64
+import io
+import xml.dom.minidom
+
+from PIL import Image
+
+from src.models import Certificate
+from src.utils.certificate_svg_utils import generate_certificate_svg
+
+
+def _signature_b64():
+    buffer = io.BytesIO()
+    Image.new("RGBA", (400, 160), (0, 0, 0, 255)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _certificate(**overrides):
+    doc = {
+        "_id": "123",
+        "credentialId": "abc123",
+        "name": "Saman <Silva>",
+        "course": "has participated in a very long workshop about many different things in the club",
+        "categoryCode": "PART",
+        "categoryName": "Participation",
+        "dateIssued": "2025-01-02",
+        "issuer": "SLIIT Mozilla",
+        "signatures": [
+            {"id": "sig1", "name": "Amal", "post": "President", "image_b64": _signature_b64()},
+            {"id": "sig2", "name": "Kamal", "post": "Secretary", "image_b64": "not-an-image"},
+        ],
+    }
+    doc.update(overrides)
+    return Certificate(**doc)
+
+def test_generate_certificate_svg_layout():
+    svg = generate_certificate_svg(_certificate())
+    dom = xml.dom.minidom.parseString(svg)
+    texts = [node.firstChild.data for node in dom.getElementsByTagName("text")]
+    assert "Saman <Silva>" in texts
+    assert "2025-01-02" in texts
+    assert {"Amal", "President", "Kamal", "Secretary"} <= set(texts)
+    # The long course text is wrapped over several lines
+    assert sum(1 for text in texts if "workshop" in text or "club." in text) >= 2
+    assert len(dom.getElementsByTagName("circle")) == 1
+
+def test_generate_certificate_svg_embeds_images_once():
+    svg = generate_certificate_svg(_certificate())
+    dom = xml.dom.minidom.parseString(svg)
+    images = dom.getElementsByTagName("image")
+    # Logo plus the one decodable signature; the broken one is skipped
+    assert len(images) == 2
+    signature = next(image for image in images if image.getAttribute("id"))
+    signature_uri = signature.getAttribute("xlink:href")
+    assert signature_uri.startswith("data:image/png;base64,")
+    # Downscaled to twice the drawn size rather than embedded at full resolution
+    data = base64.b64decode(signature_uri.split(",", 1)[1])
+    assert Image.open(io.BytesIO(data)).size == (200, 84)
+
+def test_generate_certificate_svg_shares_identical_signatures():
+    image_b64 = _signature_b64()
+    svg = generate_certificate_svg(_certificate(signatures=[
+        {"id": "sig1", "name": "Amal", "post": "President", "image_b64": image_b64},
+        {"id": "sig2", "name": "Kamal", "post": "Secretary", "image_b64": image_b64},
+    ]))
+    dom = xml.dom.minidom.parseString(svg)
+    signature_images = [
+        image for image in dom.getElementsByTagName("image") if image.getAttribute("id")
+    ]
+    assert len(signature_images) == 1
+    uses = dom.getElementsByTagName("use")
+    assert [use.getAttribute("xlink:href") for use in uses] == [
+        "#" + signature_images[0].getAttribute("id")
+    ] * 2
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from src.utils.concurrency_utils import (
+    AdmissionController,
+    OverloadedError,
+    SingleFlight,
+)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "rendered"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("abc", work) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert results == ["rendered"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {
+        "executions": 1,
+        "coalesced": 4,
+        "errors": 0,
+        "in_flight": 0,
+    }
+
+def test_single_flight_propagates_errors_and_retries():
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(
+            flight.do("abc", failing), flight.do("abc", failing), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+        async def ok():
+            return "ok"
+
+        assert await flight.do("abc", ok) == "ok"
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert flight.stats()["errors"] == 1
+    assert flight.stats()["executions"] == 2
+
+def test_single_flight_leader_cancellation_does_not_cancel_followers():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "rendered"
+
+    async def scenario():
+        flight = SingleFlight("test")
+        leader = asyncio.ensure_future(flight.do("abc", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("abc", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "rendered"
+
+def test_admission_controller_rejects_when_queue_is_full():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrent=1, max_queue=1, timeout=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 1
+
+        with pytest.raises(OverloadedError):
+            async with controller.admit():
+                pass
+
+        release.set()
+        await asyncio.gather(holder, queued)
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+    assert stats["active"] == 0
+    assert stats["queue_depth"] == 0
+
+def test_admission_controller_times_out_queued_requests():
+    async def scenario():
+        controller = AdmissionController(
+            "test", max_concurrent=1, max_queue=4, timeout=0.01
+        )
+        async with controller.admit():
+            with pytest.raises(OverloadedError):
+                async with controller.admit():
+                    pass
+        # The slot is free again once the holder leaves
+        async with controller.admit():
+            pass
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["timed_out"] == 1
+    assert stats["admitted"] == 2
+    assert stats["active"] == 0
+
+def test_single_flight_passes_overload_through_without_counting_errors(caplog):
+    async def shed():
+        raise OverloadedError("queue is full")
+
+    async def scenario():
+        flight = SingleFlight("test")
+        with pytest.raises(OverloadedError):
+            await flight.do("abc", shed)
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert flight.stats()["errors"] == 0
+    assert "failed" not in caplog.text
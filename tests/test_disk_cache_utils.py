@@ -0,0 +1,53 @@
+import os
+import time
+
+from src.utils.disk_cache_utils import TEMP_PREFIX, DiskRenderCache
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskRenderCache(str(tmp_path), max_bytes=1024)
+    assert cache.read("abc123", "png") is None
+    cache.write("abc123", "png", b"\x89PNG data")
+
+    assert bytes(cache.read("abc123", "png")) == b"\x89PNG data"
+    assert cache.lookup("abc123", "png") == str(tmp_path / "ab" / "abc123.png")
+    # Nothing but the artifact is left behind by the atomic write
+    assert os.listdir(tmp_path / "ab") == ["abc123.png"]
+    assert cache.stats()["writes"] == 1
+    assert cache.stats()["size_bytes"] == len(b"\x89PNG data")
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskRenderCache(str(tmp_path), max_bytes=250)
+    now = time.time()
+    for i, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.write(key, "png", b"x" * 100)
+        os.utime(cache.path(key, "png"), (now - 1000 + i, now - 1000 + i))
+    stale_temp = tmp_path / "aa" / f"{TEMP_PREFIX}crashed"
+    stale_temp.write_bytes(b"partial")
+    os.utime(stale_temp, (now - 3600, now - 3600))
+
+    assert cache.evict() == 1
+    assert cache.lookup("aa01", "png") is None
+    assert cache.lookup("cc03", "png") is not None
+    assert not stale_temp.exists()
+    assert cache.stats()["size_bytes"] == 200
+
+def test_disabled_disk_cache_is_a_no_op():
+    cache = DiskRenderCache("")
+    cache.write("abc123", "png", b"data")
+    assert cache.read("abc123", "png") is None
+    assert cache.evict() == 0
+
+def test_disk_cache_creates_private_directory(tmp_path):
+    cache = DiskRenderCache(str(tmp_path / "renders"))
+    assert cache.enabled
+    assert os.stat(tmp_path / "renders").st_mode & 0o777 == 0o700
+
+def test_disk_cache_refuses_directory_writable_by_others(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    cache = DiskRenderCache(str(shared))
+    assert not cache.enabled
+    cache.write("abc123", "png", b"data")
+    assert os.listdir(shared) == []
@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+pd = pytest.importorskip("pandas")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "certificate-importer"))
+from recipients import cell_text, recipient_key
+from upserts import upsert_batch
+
+
+def test_blank_email_cells_fall_back_to_the_name(tmp_path):
+    csv_file = tmp_path / "participants.csv"
+    csv_file.write_text("name,email\nSaman Silva,\nNimal Perera,\nKamal Fernando, Kamal@Example.com \n")
+    df = pd.read_csv(csv_file)
+
+    keys = [
+        recipient_key(cell_text(row["name"]), cell_text(row["email"]))
+        for _, row in df.iterrows()
+    ]
+    assert keys == ["saman silva", "nimal perera", "kamal@example.com"]
+
+def test_cell_text_treats_missing_values_as_empty():
+    assert cell_text(float("nan")) == ""
+    assert cell_text(None) == ""
+    assert cell_text("  Saman  ") == "Saman"
+
+
+def test_upsert_batch_accounts_for_upserted_failed_and_raced_rows():
+    batch = [
+        {"key": key, "name": name, "email": ""}
+        for key, name in [
+            ("existing", "Existing"),
+            ("new", "New"),
+            ("invalid", "Invalid"),
+            ("raced", "Raced"),
+        ]
+    ]
+    collection = MagicMock()
+    collection.find.side_effect = [
+        [{"recipientKey": "existing", "credentialId": "c-existing"}],
+        [{"recipientKey": "raced", "credentialId": "c-other-run"}],
+    ]
+    # Pending rows are new, invalid, raced: index 0 upserted, 1 failed, 2 matched
+    # an upsert from another run and so is neither upserted nor failed here
+    collection.bulk_write.side_effect = BulkWriteError({
+        "upserted": [{"index": 0, "_id": "oid"}],
+        "writeErrors": [{"index": 1, "code": 121, "errmsg": "Document failed validation"}],
+    })
+    scope = {"categoryCode": "LC", "course": "Club Member"}
+    stats = {"inserted": 0, "matched": 0, "failed": 0}
+
+    credential_ids, inserted = upsert_batch(
+        collection,
+        batch,
+        scope,
+        lambda row: {"credentialId": f"c-{row['key']}", "name": row["name"], **scope},
+        stats,
+    )
+
+    assert credential_ids == {
+        "existing": "c-existing",
+        "new": "c-new",
+        "raced": "c-other-run",
+    }
+    assert inserted == [{"credentialId": "c-new", "name": "New", **scope}]
+    assert stats == {"inserted": 1, "matched": 2, "failed": 1}
+    operations = collection.bulk_write.call_args.args[0]
+    assert [op._filter["recipientKey"] for op in operations] == ["new", "invalid", "raced"]
+    assert collection.find.call_args_list[1].args[0] == {
+        "recipientKey": {"$in": ["raced"]}, **scope
+    }
+
+
+def test_upsert_batch_skips_the_write_when_everyone_exists():
+    collection = MagicMock()
+    collection.find.return_value = [{"recipientKey": "a", "credentialId": "c-a"}]
+    stats = {"inserted": 0, "matched": 0, "failed": 0}
+
+    credential_ids, inserted = upsert_batch(
+        collection, [{"key": "a", "name": "A", "email": ""}], {}, dict, stats
+    )
+
+    assert credential_ids == {"a": "c-a"}
+    assert inserted == []
+    assert stats == {"inserted": 0, "matched": 1, "failed": 0}
+    collection.bulk_write.assert_not_called()
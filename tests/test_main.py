@@ -0,0 +1,54 @@
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.utils.concurrency_utils import OverloadedError
+
+client = TestClient(app)
+LOADED = ({"credentialId": "abc123", "categoryCode": "CS"}, '"abc"')
+
+
+@patch("src.main.get_degraded_payload", return_value=None)
+@patch("src.main.render_certificate_payload", new_callable=AsyncMock)
+@patch("src.main.fetch_certificate", new_callable=AsyncMock)
+def test_certificate_overload_returns_503_with_retry_after(mock_fetch, mock_render, _):
+    mock_fetch.return_value = LOADED
+    mock_render.side_effect = OverloadedError("render queue is full")
+
+    response = client.get("/api/certificate/abc123")
+    assert response.status_code == 503
+    assert response.headers["retry-after"].isdigit()
+
+@patch("src.main.get_degraded_payload", return_value=b'{"credentialId":"abc123"}')
+@patch("src.main.render_certificate_payload", new_callable=AsyncMock)
+@patch("src.main.fetch_certificate", new_callable=AsyncMock)
+def test_certificate_overload_serves_stale_render(mock_fetch, mock_render, _):
+    mock_fetch.return_value = LOADED
+    mock_render.side_effect = OverloadedError("render deadline exceeded")
+
+    response = client.get("/api/certificate/abc123/image")
+    assert response.status_code == 200
+    assert response.headers["x-certify-degraded"] == "1"
+    assert response.headers["cache-control"] == "no-store"
+    assert response.headers["content-type"] == "image/png"
+    assert "etag" not in response.headers
+
+@patch("src.main.render_certificate_payload", new_callable=AsyncMock)
+@patch("src.main.fetch_certificate", new_callable=AsyncMock)
+def test_certificate_image_on_disk_is_served_as_a_file(mock_fetch, mock_render, tmp_path):
+    mock_fetch.return_value = LOADED
+    artifact = tmp_path / "artifact.png"
+    artifact.write_bytes(b"\x89PNG stored render")
+
+    with patch("src.main.disk_cache.lookup", return_value=str(artifact)):
+        response = client.get("/api/certificate/abc123/image")
+    assert response.status_code == 200
+    assert response.content == b"\x89PNG stored render"
+    assert response.headers["etag"] == '"abc-image"'
+    mock_render.assert_not_called()
+
+@patch("src.main.signing_configured", return_value=False)
+def test_verify_requires_a_signing_key(_):
+    assert client.get("/api/certificate/abc123/verify").status_code == 503
+    assert client.get("/api/verify/public-key").status_code == 503
@@ -0,0 +1,23 @@
+from src.utils.process_utils import (
+    available_cpus,
+    current_rss_bytes,
+    peak_allocation,
+)
+
+
+def test_available_cpus_is_positive():
+    assert available_cpus() >= 1
+
+def test_current_rss_bytes_reports_resident_memory():
+    # A running interpreter always holds at least a few megabytes
+    assert current_rss_bytes() > 1024 * 1024
+
+def test_peak_allocation_counts_temporary_buffers():
+    def build():
+        scratch = bytearray(4 * 1024 * 1024)
+        del scratch
+        return "done"
+
+    result, peak = peak_allocation(build)
+    assert result == "done"
+    assert peak >= 4 * 1024 * 1024
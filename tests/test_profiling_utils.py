@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+import time
+from unittest.mock import patch
+
+from src.utils.profiling_utils import (
+    PROFILED_PATHS,
+    ProfilingMiddleware,
+    SamplingProfiler,
+    run_in_threadpool,
+    save_profile,
+)
+
+
+def _busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_sampling_profiler_produces_folded_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    _busy_loop(0.05)
+    profiler.stop()
+
+    folded = profiler.folded()
+    assert "_busy_loop (test_profiling_utils.py" in folded
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack
+    assert int(count) > 0
+
+def test_profiled_paths():
+    assert PROFILED_PATHS.match("/api/certificate/abc123")
+    assert PROFILED_PATHS.match("/api/certificate/abc123/image")
+    assert PROFILED_PATHS.match("/api/login")
+    assert not PROFILED_PATHS.match("/api/admin/metrics")
+
+def _unrelated_loop(stop):
+    while not stop.is_set():
+        pass
+
+def test_sampling_profiler_with_task_skips_other_requests():
+    async def scenario():
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start(asyncio.current_task())
+        await run_in_threadpool(_busy_loop, 0.05)
+        profiler.stop()
+        return profiler.folded()
+
+    stop = threading.Event()
+    other = threading.Thread(target=_unrelated_loop, args=(stop,))
+    other.start()
+    try:
+        folded = asyncio.run(scenario())
+    finally:
+        stop.set()
+        other.join()
+    assert "_busy_loop (test_profiling_utils.py" in folded
+    assert "_unrelated_loop" not in folded
+
+def test_save_profile_keeps_newest_files(tmp_path):
+    profiler = SamplingProfiler()
+    for _ in range(3):
+        save_profile(profiler, "/api/login", directory=str(tmp_path), max_files=2)
+    assert len(os.listdir(tmp_path)) == 2
+
+def _call_middleware(headers):
+    sent = []
+    reached = []
+
+    async def app(scope, receive, send):
+        reached.append(scope["path"])
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": "/api/login", "headers": headers}
+    asyncio.run(ProfilingMiddleware(app)(scope, None, send))
+    return sent, reached
+
+@patch("src.utils.profiling_utils._is_admin", return_value=True)
+def test_profiling_middleware_rejects_unknown_mode(_):
+    sent, reached = _call_middleware([(b"x-certify-profile", b"flamegraph")])
+    assert sent[0]["status"] == 400
+    assert reached == []
+
+def test_profiling_middleware_ignores_the_header_without_admin_token():
+    # Non-admins get the normal response whatever the value, so the hook stays hidden
+    sent, reached = _call_middleware([(b"x-certify-profile", b"flamegraph")])
+    assert sent == []
+    assert reached == ["/api/login"]
@@ -1,11 +1,31 @@
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from src.utils.auth_utils import hash_password, verify_password
 from src.utils.common_utils import generate_credential_id
 from src.utils.db_utils import (
+    CERTIFICATE_INDEXES,
+    CERTIFICATE_VERIFY_PROJECTION,
+    PoolStatsListener,
+    decode_cursor,
+    encode_cursor,
+    ensure_certificate_stats,
     get_certificate_by_credential,
+    get_certificate_for_verification,
+    get_certificate_stats,
     get_signatures_by_ids,
+    rebuild_certificate_stats,
+    record_certificates_issued,
+    search_certificates,
     seed_certificates,
     seed_signatures,
+    set_signature_image,
+    signature_image_digest,
+    sync_signature_digests,
 )
 
 
@@ -21,11 +41,48 @@ def test_get_certificate_by_credential(mock_db):
     mock_collection = MagicMock()
     mock_collection.find_one.return_value = fake_cert
     mock_db.__getitem__.return_value = mock_collection
+    mock_collection.with_options.return_value = mock_collection
 
     result = get_certificate_by_credential("abc123")
     assert result["_id"] == "123"
     assert result["credentialId"] == "abc123"
 
+@patch("src.utils.db_utils.db")
+def test_get_certificate_by_credential_falls_back_to_primary(mock_db):
+    primary = MagicMock()
+    secondary = MagicMock()
+    primary.with_options.return_value = secondary
+    secondary.find_one.return_value = None
+    primary.find_one.return_value = {"credentialId": "abc123", "_id": "123"}
+    mock_db.__getitem__.return_value = primary
+
+    assert get_certificate_by_credential("abc123")["_id"] == "123"
+    secondary.find_one.assert_called_once()
+    primary.find_one.assert_called_once()
+
+@patch("src.utils.db_utils.db")
+def test_get_certificate_for_verification_is_projected(mock_db):
+    mock_collection = MagicMock()
+    mock_collection.find_one.return_value = {"credentialId": "abc123", "name": "Saman"}
+    mock_db.__getitem__.return_value = mock_collection
+    mock_collection.with_options.return_value = mock_collection
+
+    assert get_certificate_for_verification("abc123")["name"] == "Saman"
+    query, projection = mock_collection.find_one.call_args[0]
+    assert query == {"credentialId": "abc123"}
+    assert projection == CERTIFICATE_VERIFY_PROJECTION
+    assert projection["_id"] == 0 and "signatures" not in projection
+
+def test_every_listing_filter_has_an_index():
+    # Equality filters first, then the sort keys, so pages never sort in memory
+    indexes = [tuple(field for field, _ in keys) for keys, _ in CERTIFICATE_INDEXES]
+    for filters in [(), ("categoryCode",), ("course",), ("categoryCode", "course")]:
+        for sort in [("dateIssued", "_id"), ("name", "_id")]:
+            assert any(
+                set(index[:len(filters)]) == set(filters) and index[len(filters):] == sort
+                for index in indexes
+            ), (filters, sort)
+
 @patch("src.utils.db_utils.db")
 def test_get_signatures_by_ids(mock_db, caplog):
     fake_signatures = [
@@ -35,6 +92,7 @@ def test_get_signatures_by_ids(mock_db, caplog):
     mock_collection = MagicMock()
     mock_collection.find.return_value = fake_signatures
     mock_db.__getitem__.return_value = mock_collection
+    mock_collection.with_options.return_value = mock_collection
 
     caplog.set_level("INFO")
     result = get_signatures_by_ids(["sig1", "sig2", "sig3"])
@@ -42,6 +100,16 @@ def test_get_signatures_by_ids(mock_db, caplog):
     assert "_id" in result[0]
     assert "Signatures not found" in caplog.text
 
+@patch("src.utils.db_utils.db")
+def test_get_signatures_by_ids_without_images(mock_db):
+    mock_collection = MagicMock()
+    mock_collection.find.return_value = [{"id": "sig1", "_id": 1}]
+    mock_db.__getitem__.return_value = mock_collection
+    mock_collection.with_options.return_value = mock_collection
+
+    get_signatures_by_ids(["sig1"], include_images=False)
+    assert mock_collection.find.call_args[0][1] == {"image_b64": 0}
+
 @patch("src.utils.db_utils.db")
 def test_seed_signatures(mock_db):
     mock_collection = MagicMock()
@@ -60,3 +128,195 @@ def test_seed_certificates(mock_db):
     seed_certificates()
     mock_collection.insert_one.assert_called()
 
+
+def test_pool_stats_listener_tracks_checkouts():
+    listener = PoolStatsListener()
+    listener.connection_created(SimpleNamespace())
+    listener.connection_checked_out(SimpleNamespace(duration=0.004))
+    listener.connection_checked_out(SimpleNamespace(duration=0.002))
+    listener.connection_checked_in(SimpleNamespace())
+    listener.connection_check_out_failed(SimpleNamespace(duration=0.006))
+
+    stats = listener.snapshot()
+    assert stats["open_connections"] == 1
+    assert stats["checked_out"] == 1
+    assert stats["peak_checked_out"] == 2
+    assert stats["checkouts"] == 2
+    assert stats["checkout_failures"] == 1
+    assert round(stats["avg_checkout_wait_ms"], 3) == 4.0
+    assert round(stats["max_checkout_wait_ms"], 3) == 6.0
+
+def test_cursor_round_trip():
+    object_id = ObjectId()
+    assert decode_cursor(encode_cursor("2025-01-02", object_id)) == (
+        "2025-01-02",
+        object_id,
+    )
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+@patch("src.utils.db_utils.db")
+def test_search_certificates_keyset_pagination(mock_db):
+    ids = [ObjectId() for _ in range(3)]
+    docs = [
+        {"_id": ids[i], "credentialId": f"c{i}", "dateIssued": f"2025-01-0{3 - i}"}
+        for i in range(3)
+    ]
+    mock_collection = MagicMock()
+    mock_collection.find.return_value.sort.return_value.limit.side_effect = (
+        lambda n: [dict(doc) for doc in docs]
+    )
+    mock_db.__getitem__.return_value = mock_collection
+    mock_collection.with_options.return_value = mock_collection
+
+    page = search_certificates(category_code="LC", limit=2)
+    assert [d["credentialId"] for d in page["items"]] == ["c0", "c1"]
+    assert "_id" not in page["items"][0]
+    assert decode_cursor(page["nextCursor"]) == ("2025-01-02", ids[1])
+    mock_collection.find.return_value.sort.return_value.limit.assert_called_with(3)
+
+    search_certificates(category_code="LC", limit=2, cursor=page["nextCursor"])
+    query = mock_collection.find.call_args[0][0]
+    assert query["$and"][0] == {"categoryCode": "LC"}
+    assert query["$and"][1]["$or"][0] == {"dateIssued": {"$lt": "2025-01-02"}}
+
+@patch("src.utils.db_utils.db")
+def test_search_certificates_page_ending_without_sort_field(mock_db):
+    ids = [ObjectId() for _ in range(2)]
+    mock_collection = MagicMock()
+    mock_collection.find.return_value.sort.return_value.limit.side_effect = (
+        lambda n: [{"_id": ids[0], "credentialId": "c0"}, {"_id": ids[1], "credentialId": "c1"}]
+    )
+    mock_db.__getitem__.return_value = mock_collection
+    mock_collection.with_options.return_value = mock_collection
+
+    page = search_certificates(limit=1)
+    assert decode_cursor(page["nextCursor"]) == (None, ids[0])
+
+    search_certificates(limit=1, cursor=page["nextCursor"])
+    query = mock_collection.find.call_args[0][0]
+    assert query["$and"][0]["$or"][1] == {"dateIssued": None, "_id": {"$lt": ids[0]}}
+
+@patch("src.utils.db_utils.db")
+def test_record_certificates_issued(mock_db):
+    mock_collection = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    cert = {"categoryCode": "LC", "course": "Club Member", "dateIssued": "2025-01-02"}
+    record_certificates_issued([cert, cert])
+
+    operations = mock_collection.bulk_write.call_args[0][0]
+    increments = {
+        op._filter["_id"]["dimension"]: op._doc["$inc"]["count"] for op in operations
+    }
+    assert increments == {"total": 2, "categoryCode": 2, "course": 2, "day": 2}
+
+@patch("src.utils.db_utils.db")
+def test_record_certificates_issued_counts_missing_fields_as_null(mock_db):
+    mock_collection = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+
+    record_certificates_issued([{"course": "Club Member"}])
+
+    operations = mock_collection.bulk_write.call_args[0][0]
+    keys = {op._filter["_id"]["dimension"]: op._filter["_id"]["value"] for op in operations}
+    assert keys["categoryCode"] is None
+    assert keys["day"] is None
+
+@patch("src.utils.db_utils.rebuild_certificate_stats")
+@patch("src.utils.db_utils.db")
+def test_ensure_certificate_stats_rebuilds_when_empty(mock_db, mock_rebuild):
+    stats, certificates = MagicMock(), MagicMock()
+    stats.count_documents.return_value = 0
+    certificates.count_documents.return_value = 1
+    mock_db.__getitem__.side_effect = lambda name: (
+        certificates if name == "certificates" else stats
+    )
+
+    ensure_certificate_stats()
+    mock_rebuild.assert_called_once()
+
+    stats.count_documents.return_value = 1
+    ensure_certificate_stats()
+    mock_rebuild.assert_called_once()
+
+@patch("src.utils.db_utils.rebuild_certificate_stats")
+@patch("src.utils.db_utils.db")
+def test_ensure_certificate_stats_logs_a_failed_rebuild(mock_db, mock_rebuild):
+    mock_db.__getitem__.return_value.count_documents.side_effect = [0, 1]
+    mock_rebuild.side_effect = OperationFailure("$merge is not supported")
+
+    ensure_certificate_stats()  # does not raise, so startup carries on
+
+@patch("src.utils.db_utils.db")
+def test_rebuild_certificate_stats_only_removes_counters_it_replaced(mock_db):
+    stale = {"dimension": "course", "value": "Retired"}
+    stats, certificates = MagicMock(), MagicMock()
+    stats.find.return_value = [{"_id": stale}]
+    mock_db.__getitem__.side_effect = lambda name: (
+        certificates if name == "certificates" else stats
+    )
+
+    rebuild_certificate_stats()
+
+    rebuilt_at = certificates.aggregate.call_args[0][0][3]["$set"]["rebuiltAt"]
+    # Counters an import upserts mid-rebuild are not in the snapshot, so survive
+    stats.delete_many.assert_called_once_with(
+        {"_id": {"$in": [stale]}, "rebuiltAt": {"$ne": rebuilt_at}}
+    )
+
+@patch("src.utils.db_utils.db")
+def test_get_certificate_stats(mock_db):
+    mock_collection = MagicMock()
+    mock_collection.find.return_value = [
+        {"_id": {"dimension": "total", "value": "all"}, "count": 3},
+        {"_id": {"dimension": "categoryCode", "value": "LC"}, "count": 3},
+        {"_id": {"dimension": "day", "value": "2025-01-02"}, "count": 1},
+        {"_id": {"dimension": "day", "value": "2025-01-01"}, "count": 2},
+    ]
+    mock_db.__getitem__.return_value = mock_collection
+    mock_collection.with_options.return_value = mock_collection
+
+    stats = get_certificate_stats()
+    assert stats["total"] == 3
+    assert stats["byCategory"] == {"LC": 3}
+    assert stats["byCourse"] == {}
+    assert list(stats["byDay"]) == ["2025-01-01", "2025-01-02"]
+
+@patch("src.utils.db_utils.db")
+def test_set_signature_image_updates_its_digest(mock_db):
+    mock_collection = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+    mock_collection.update_one.return_value.matched_count = 1
+
+    assert set_signature_image("sig1", "BBBB")
+    mock_collection.update_one.assert_called_once_with(
+        {"id": "sig1"},
+        {"$set": {"image_b64": "BBBB", "imageDigest": signature_image_digest("BBBB")}},
+    )
+
+@patch("src.utils.db_utils.db")
+def test_sync_signature_digests_fixes_missing_and_stale_digests(mock_db):
+    mock_collection = MagicMock()
+    mock_db.__getitem__.return_value = mock_collection
+    mock_collection.find.return_value = [
+        {"_id": 1, "image_b64": "AAAA", "imageDigest": signature_image_digest("AAAA")},
+        {"_id": 2, "image_b64": "BBBB", "imageDigest": signature_image_digest("AAAA")},
+        {"_id": 3, "image_b64": "CCCC"},
+    ]
+
+    assert sync_signature_digests() == 2
+    operations = mock_collection.bulk_write.call_args[0][0]
+    assert {op._filter["_id"]: op._doc["$set"]["imageDigest"] for op in operations} == {
+        2: signature_image_digest("BBBB"),
+        3: signature_image_digest("CCCC"),
+    }
+
+def test_password_hashes_verify_with_bcrypt():
+    hashed = hash_password("1234")
+    assert hashed.startswith("$2b$")
+    assert verify_password("1234", hashed)
+    assert not verify_password("12345", hashed)
+    # bcrypt only reads 72 bytes; longer passwords are truncated rather than rejected
+    assert verify_password("a" * 80, hash_password("a" * 72))
+    assert not verify_password("1234", "not-a-bcrypt-hash")
@@ -0,0 +1,65 @@
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from src.utils.verification_utils import (
+    build_verification,
+    check_verification,
+    key_id,
+    load_signing_key,
+)
+
+SEED = "AAECAwQFBgcICQoLDA0ODxAREhMUFRYXGBkaGxwdHh8="
+SIGNING_KEY = load_signing_key(SEED)
+PUBLIC_KEY = SIGNING_KEY.public_key()
+
+
+def _cert_doc(**overrides):
+    doc = {
+        "credentialId": "abc123",
+        "name": "Saman Silva",
+        "course": "Club Member",
+        "categoryCode": "LC",
+        "categoryName": "Leadership & Contribution",
+        "dateIssued": "2025-01-02",
+        "issuer": "Mozilla Campus Club SLIIT",
+    }
+    doc.update(overrides)
+    return doc
+
+def test_build_verification_is_deterministic():
+    payload = build_verification(_cert_doc(), SIGNING_KEY)
+    assert payload["valid"] is True
+    assert payload["recipient"] == "Saman Silva"
+    assert payload["digest"].startswith("sha256:")
+    assert payload["signatureAlgorithm"] == "Ed25519"
+    assert payload["keyId"] == key_id(PUBLIC_KEY)
+    assert payload == build_verification(_cert_doc(), SIGNING_KEY)
+    other = build_verification(_cert_doc(name="Nimal Perera"), SIGNING_KEY)
+    assert other["digest"] != payload["digest"]
+
+def test_build_verification_keeps_a_missing_date_null():
+    cert_doc = _cert_doc()
+    del cert_doc["dateIssued"]
+    payload = build_verification(cert_doc, SIGNING_KEY)
+    assert payload["dateIssued"] is None
+    assert check_verification(payload, PUBLIC_KEY)
+
+def test_check_verification_detects_tampering():
+    payload = build_verification(_cert_doc(), SIGNING_KEY)
+    assert check_verification(payload, PUBLIC_KEY)
+    assert not check_verification({**payload, "recipient": "Nimal Perera"}, PUBLIC_KEY)
+    assert not check_verification({**payload, "signature": "0" * 128}, PUBLIC_KEY)
+    assert not check_verification({**payload, "signature": "not-hex"}, PUBLIC_KEY)
+
+def test_check_verification_rejects_other_keys():
+    # The public key cannot sign, and another key's signature does not verify
+    forged = build_verification(_cert_doc(), Ed25519PrivateKey.generate())
+    assert not check_verification(forged, PUBLIC_KEY)
+
+def test_load_signing_key_accepts_pem():
+    pem = SIGNING_KEY.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode("ascii")
+    assert key_id(load_signing_key(pem).public_key()) == key_id(PUBLIC_KEY)